@@ -1,255 +1,2178 @@
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import argparse
+import importlib.util
+import cProfile
+import multiprocessing
+import tracemalloc
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
+from functools import cached_property
 from datetime import datetime
-from scipy.stats import mannwhitneyu
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 warnings.filterwarnings("ignore")
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 #config
-DATA_PATH = "../data/"
-OUTPUT_PATH = "../outputs/"
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = BASE_DIR / "data"
+OUTPUT_PATH = BASE_DIR / "outputs"
+
+SENTIMENT_FILE = "fear_greed_index.csv"
+TRADER_FILE = "historical_data.csv"
+
+#columnar cache of the cleaned trader data, stored under DATA_PATH
+CACHE_DIR = ".cache/"
+CACHE_VERSION = 1
+USE_CACHE = True
+
+#trade -> sentiment alignment: "date" matches the IST calendar day of the trade,
+#"asof" takes the latest UTC reading at or before the trade (within tolerance);
+#SENTIMENT_LAG shifts the lookup back, e.g. "1D" for previous-day sentiment
+SENTIMENT_JOIN = "date"
+SENTIMENT_LAG = "0h"
+SENTIMENT_TOLERANCE = "1D"
+TRADE_TIMEZONE = "Asia/Kolkata"
+
+#batched sentiment tests: metrics compared (None = every numeric daily
+#metric), segment columns crossed with sentiment, and the resampling setup
+STATS_METRICS = None
+STATS_SEGMENTS = ["volume_segment", "frequency_segment", "performance_segment"]
+STATS_RESAMPLES = 1000
+STATS_SEED = 42
+STATS_CONFIDENCE = 0.95
+STATS_WORKERS = None
+STATS_BATCH = 10_000_000
+STATS_FILE = "statistical_tests.csv"
+
+#same-day profitability model (notebook features: the day's own activity plus lagged pnl/win rate), walk-forward over months
+MODEL_FEATURES = [
+    "sentiment_encoded", "volume_seg_encoded", "frequency_seg_encoded",
+    "performance_seg_encoded", "num_trades", "buy_ratio",
+    "day_of_week", "win_rate_lag", "pnl_lag", "avg_trade_size",
+]
+#segment features are re-derived per fold from its training months only, so a
+#fold never sees the outcomes of its test month
+MODEL_SEGMENT_FEATURES = {
+    "volume_seg_encoded": "volume_segment",
+    "frequency_seg_encoded": "frequency_segment",
+    "performance_seg_encoded": "performance_segment",
+}
+MODEL_PARAMS = {
+    "n_estimators": 100,
+    "max_depth": 10,
+    "min_samples_split": 20,
+    "random_state": 42,
+    "class_weight": "balanced",
+}
+MODEL_MIN_TRAIN_MONTHS = 3
+MODEL_WORKERS = None
+MODEL_VERSION = 2
+MODEL_FOLDS_FILE = "model_folds.csv"
+FEATURE_IMPORTANCE_FILE = "feature_importance.csv"
+
+#hash-partition the merged trades by account and process shards in parallel
+SHARDS = None
+
+#compact dtypes for the merged trade frame (int32 account codes, categoricals)
+COMPACT_DTYPES = True
+
+#aggregated measures stay float64 so sums and means are unchanged
+MEASURE_COLUMNS = ["closed_pnl", "size_usd", "fee"]
+
+#sentiment index thresholds used when the label itself is not Fear/Greed
+FEAR_THRESHOLD = 45
+GREED_THRESHOLD = 55
+EXTREME_FEAR_THRESHOLD = 25
+EXTREME_GREED_THRESHOLD = 75
+
+#incremental mode keeps mergeable per-day / per-account state under OUTPUT_PATH
+STATE_DIR = "state/"
+
+#trailing calendar windows (days) for the rolling metrics, each also
+#conditioned on the sentiment regime of the days inside it
+ROLLING_WINDOWS = [7, 30, 90]
+ROLLING_REGIMES = ["All", "Fear", "Greed"]
+ROLLING_FILE = "rolling_metrics.csv"
+ROLLING_BLOCK = 4_000_000  # window rows expanded at once for the exact variance pass
+
+#equity curves / drawdowns are traced per account for all trades and per regime
+DRAWDOWN_REGIMES = ["All", "Fear", "Greed"]
+DRAWDOWN_FILE = "trader_drawdowns.csv"
+
+#analytics cube: additive trade stats at (account, coin, day, sentiment) grain;
+#coarser slices are rolled up from the cube instead of re-reading the trades
+CUBE_KEYS = ["account", "coin", "trade_date", "sentiment_binary"]
+CUBE_ROLLUPS = [["sentiment_binary"], ["coin"], ["coin", "sentiment_binary"], ["account", "coin"]]
+CUBE_FILE = "analytics_cube"
+CUBE_SUMMARY_FILE = "coin_sentiment_summary.csv"
+
+#intraday mode: per (account, time bucket) metrics and a time-of-day x sentiment
+#profile, from the same bucket-grain pass as the daily metrics (e.g. "1h", "30min")
+INTRADAY_BUCKET = None
+INTRADAY_FILE = "intraday_metrics"
+INTRADAY_PROFILE_FILE = "intraday_sentiment_profile.csv"
+
+#daily / profile exports: parquet or feather (needs pyarrow) or csv; the daily
+#frames are written as hive-partitioned datasets, one directory per partition
+EXPORT_FORMAT = "parquet"
+EXPORT_COMPRESSION = "zstd"  # None keeps feather files zero-copy when memory-mapped
+EXPORT_PARTITIONS = ["sentiment_binary", "month"]
+
+#validation: rows breaking a rule are dropped before any metric and written to
+#a quarantine CSV per source, with per-rule counts in VALIDATION_FILE
+VALIDATE = True
+TRADER_REQUIRED_COLUMNS = ["account", "coin", "side", "timestamp_ist", "closed_pnl", "size_usd", "fee"]
+SENTIMENT_VALUE_RANGE = (0, 100)
+#duplicate_fill keeps a hash of every trade seen (8 bytes a row) for the whole
+#run: None checks in-memory runs only, streaming/spill runs opt in with --dedupe-fills
+DEDUPE_FILLS = None
+QUARANTINE_FILES = {"sentiment": "quarantine_sentiment.csv", "trades": "quarantine_trades.csv"}
+VALIDATION_FILE = "validation_report.csv"
+
+#report: one (segment x sentiment x metric) mean/median/count table per run,
+#every insight and strategy figure is read from it; rendered as csv/html/md
+REPORT_METRICS = ["daily_pnl", "net_pnl", "win_rate", "num_trades", "avg_trade_size",
+                  "pnl_volatility", "buy_ratio", "total_volume"]
+REPORT_STATS = ["mean", "median", "count"]
+REPORT_FORMATS = None  # None renders every format in REPORT_RENDERERS
+REPORT_SUMMARY_FILE = "report_summary.csv"
+REPORT_DOCUMENT = "insights_report"
+
+#execution backend for metrics / segments / export: "pandas" holds the trades
+#in memory, "spill" range-partitions them by account on disk under SPILL_DIR
+#and processes one partition at a time (same results, bounded memory)
+BACKEND = "pandas"
+BACKENDS = ["pandas", "spill"]
+SPILL_DIR = ".spill/"
+SPILL_PREFIX_CHARS = 4
+SPILL_WORKERS = None
+SPILL_COLUMNS = ["account", "trade_date", "sentiment_binary", "side", "closed_pnl", "size_usd", "fee"]
+
+#streaming mode reads the trader export in bounded chunks
+STREAMING = False
+CHUNK_SIZE = 1_000_000
+
+#columns kept from the trader export after cleaning
+TRADER_COLUMNS = [
+    "account", "coin", "side", "trade_time", "trade_date",
+    "closed_pnl", "size_usd", "fee"
+]
+
+#grouping keys of the daily metrics
+DAILY_KEYS = ["account", "trade_date", "sentiment_binary"]
+
+#per-stage timings; --profile adds cProfile dumps and tracemalloc peaks
+PROFILE = False
+PROFILE_DIR = "profile/"
+REPORT_FILE = "run_report"
+
+#figures are rendered in a process pool and skipped when their summary is unchanged
+FIGURE_WORKERS = None
+FIGURE_VERSION = 1
+FIGURE_CACHE_FILE = ".figure_cache.json"
+
+#headless runs never import matplotlib/seaborn
+HEADLESS = False
+
+#on-disk stage results, keyed by input fingerprint + stage version, LRU-bounded
+STAGE_CACHE_DIR = ".stage_cache/"
+STAGE_CACHE_MAX_MB = 512
+STAGE_VERSIONS = {"metrics": 2, "segments": 1, "drawdowns": 1, "cube": 1, "stats": 1}
+
+#columnar cache
+def _hash_file(path, block_size=1 << 24):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_columnar(df, directory, meta=None):
+    # one .npy file per column; strings are stored as sorted dictionary codes
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            np.save(directory / f"{name}.npy", col.to_numpy(dtype="datetime64[ns]"))
+            columns[name] = {"kind": "datetime"}
+        elif pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+            np.save(directory / f"{name}.npy", col.to_numpy())
+            columns[name] = {"kind": "numeric"}
+        else:
+            codes, uniques = pd.factorize(col, sort=True)
+            np.save(directory / f"{name}.npy", codes.astype(np.int32))
+            columns[name] = {"kind": "categorical", "categories": [str(u) for u in uniques]}
+
+    manifest = {"version": CACHE_VERSION, "rows": len(df), "columns": columns}
+    manifest.update(meta or {})
+
+    # the manifest is written last so a half-written cache is never picked up
+    _write_manifest(directory, manifest)
+
+
+def _write_manifest(directory, manifest):
+    tmp_path = Path(directory) / "manifest.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, Path(directory) / "manifest.json")
+
+
+def _read_manifest(directory):
+    manifest_path = Path(directory) / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _read_columnar(directory, columns=None, manifest=None):
+    directory = Path(directory)
+    manifest = manifest or _read_manifest(directory)
+
+    data = {}
+    for name in columns or list(manifest["columns"]):
+        spec = manifest["columns"][name]
+        values = np.load(directory / f"{name}.npy")
+        if spec["kind"] == "categorical":
+            values = pd.Categorical.from_codes(
+                values, categories=spec["categories"]
+            ).astype(object)
+        data[name] = values
+
+    return pd.DataFrame(data)
+
+
+def _cache_is_fresh(cache_dir, manifest, source_path):
+    # size + mtime is the fast path; a touched but unchanged file is
+    # recognised by its content hash and the manifest is refreshed
+    if manifest is None:
+        return False
+    stat = os.stat(source_path)
+    source = manifest["source"]
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    if _hash_file(source_path) != source["hash"]:
+        return False
+    source["mtime_ns"] = stat.st_mtime_ns
+    _write_manifest(cache_dir, manifest)
+    return True
+
+
+#validation
+class FillIndex:
+    # 64-bit hashes of every fill seen so far, kept as sorted runs that at
+    # least halve in size from one to the next: a lookup searches O(log n)
+    # runs and each hash is re-sorted O(log n) times over the whole input
+
+    def __init__(self):
+        self.runs = []
+
+    def seen_before(self, hashes):
+        order = np.argsort(hashes, kind="stable")
+        sorted_hashes = hashes[order]
+
+        # within the batch every copy after the first is a repeat
+        repeated = np.zeros(len(hashes), dtype=bool)
+        repeated[order[1:]] = sorted_hashes[1:] == sorted_hashes[:-1]
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            repeated |= run[positions] == hashes
+
+        new = np.sort(hashes[~repeated])
+        if len(new):
+            self.runs.append(new)
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]))
+        return repeated
+
+
+class DataValidator:
+    # per-rule violation counts for one run; rejected rows are appended to a
+    # quarantine CSV per source, tagged with every rule they broke
+
+    def __init__(self, quarantine_dir=None, append=False, dedupe=True):
+        self.quarantine_dir = quarantine_dir
+        self.counts = {}
+        self.rows_checked = {}
+        self.rejected = {}
+        self.fills = FillIndex() if dedupe else None
+
+        if quarantine_dir is not None:
+            Path(quarantine_dir).mkdir(parents=True, exist_ok=True)
+            for source in QUARANTINE_FILES if not append else []:
+                self.quarantine_file(source).unlink(missing_ok=True)
+
+    def quarantine_file(self, source):
+        if self.quarantine_dir is None:
+            return None
+        return Path(self.quarantine_dir) / QUARANTINE_FILES[source]
+
+    def apply(self, source, raw_df, rules):
+        # rules maps a rule name to its per-row violation mask; returns the
+        # mask of rows to keep
+        names = list(rules)
+        violations = np.column_stack([np.asarray(rules[name], dtype=bool) for name in names])
+        rejected = violations.any(axis=1)
+
+        counts = self.counts.setdefault(source, dict.fromkeys(names, 0))
+        for name, total in zip(names, violations.sum(axis=0)):
+            counts[name] += int(total)
+        self.rows_checked[source] = self.rows_checked.get(source, 0) + len(raw_df)
+        self.rejected[source] = self.rejected.get(source, 0) + int(rejected.sum())
+
+        path = self.quarantine_file(source)
+        if path is not None and rejected.any():
+            quarantined = raw_df[rejected].copy()
+            quarantined["rejected_rules"] = [
+                "|".join(np.compress(row, names)) for row in violations[rejected]
+            ]
+            quarantined.to_csv(path, mode="a", header=not path.exists(), index=False)
+
+        return ~rejected
+
+    def snapshot(self, source):
+        return {"rows_checked": self.rows_checked.get(source, 0),
+                "rejected": self.rejected.get(source, 0),
+                "counts": self.counts.get(source, {})}
+
+    def restore(self, source, snapshot, quarantine_path=None):
+        # replays the result of a validation done when a cache was written
+        self.rows_checked[source] = snapshot["rows_checked"]
+        self.rejected[source] = snapshot["rejected"]
+        self.counts[source] = dict(snapshot["counts"])
+        path = self.quarantine_file(source)
+        if path is not None and quarantine_path is not None and Path(quarantine_path).exists():
+            shutil.copy(quarantine_path, path)
+
+    def report(self):
+        return pd.DataFrame([
+            {"source": source, "rule": rule, "rows_checked": self.rows_checked[source],
+             "violations": violations}
+            for source, counts in self.counts.items()
+            for rule, violations in counts.items()
+        ], columns=["source", "rule", "rows_checked", "violations"])
+
+    def write_report(self, output_path=None):
+        report = self.report()
+        report.to_csv(_output_file(VALIDATION_FILE, output_path), index=False)
+
+        print("\n📋 Data validation:")
+        print(report.to_string(index=False))
+        for source, rejected in self.rejected.items():
+            if rejected and self.quarantine_dir is not None:
+                print(f"⚠️  {source}: {rejected:,} rows quarantined in {QUARANTINE_FILES[source]}")
+        print(f"✅ Saved: {VALIDATION_FILE}")
+        return report
+
+
+def _fill_hashes(trader_df, measures):
+    # read_csv infers dtypes chunk by chunk, so numbers are hashed as float64
+    # and the measures in their parsed form: a repeated fill hashes the same
+    # whichever chunk it lands in
+    columns = {}
+    for name in trader_df.columns:
+        column = measures.get(name, trader_df[name])
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            column = column.astype("float64")
+        columns[name] = column
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+
+def _clean_trader_frame(trader_df, validator=None):
+
+    # normalize column names
+    trader_df.columns = (
+        trader_df.columns
+        .str.strip()
+        .str.lower()
+        .str.replace(" ", "_")
+    )
+
+    missing = [column for column in TRADER_REQUIRED_COLUMNS if column not in trader_df.columns]
+    if missing:
+        raise ValueError(f"Trader data is missing columns: {missing}")
+
+    trade_time = pd.to_datetime(
+        trader_df["timestamp_ist"],
+        format="%d-%m-%Y %H:%M",
+        errors="coerce"
+    )
+    measures = {
+        column: pd.to_numeric(trader_df[column], errors="coerce")
+        for column in MEASURE_COLUMNS
+    }
+
+    if validator is not None:
+        rules = {
+            "unparseable_timestamp": trade_time.isna().to_numpy(),
+            "non_numeric_value": np.logical_or.reduce([
+                (measures[column].isna() & trader_df[column].notna()).to_numpy()
+                for column in MEASURE_COLUMNS
+            ]),
+            "negative_size": (measures["size_usd"] < 0).to_numpy(),
+        }
+        if validator.fills is not None:
+            rules["duplicate_fill"] = validator.fills.seen_before(_fill_hashes(trader_df, measures))
+        keep = validator.apply("trades", trader_df, rules)
+        if not keep.all():
+            trader_df, trade_time = trader_df[keep].copy(), trade_time[keep]
+            measures = {column: values[keep] for column, values in measures.items()}
+
+    trader_df["trade_time"] = trade_time
+    trader_df["trade_date"] = trade_time.dt.normalize()
+
+    # blank measures count as zero
+    for column, values in measures.items():
+        trader_df[column] = values.fillna(0)
+
+    return trader_df[TRADER_COLUMNS]
+
+
+def _data_file(name, data_path=None):
+    return Path(data_path or DATA_PATH) / name
+
+
+def _output_file(name, output_path=None):
+    return Path(output_path or OUTPUT_PATH) / name
+
+
+def load_trader_data(columns=None, data_path=None, use_cache=None, validator=None):
+
+    source_path = _data_file(TRADER_FILE, data_path)
+    columns = columns or TRADER_COLUMNS
+    use_cache = USE_CACHE if use_cache is None else use_cache
+
+    if not use_cache:
+        return _clean_trader_frame(pd.read_csv(source_path), validator)[columns]
+
+    cache_dir = _data_file(CACHE_DIR, data_path) / "trader"
+    manifest = _read_manifest(cache_dir)
+    validated = validator is not None
+    deduped = validated and validator.fills is not None
+    # the cache keeps the validation result and quarantined rows, so a cache
+    # hit reports the same counts as the pass that wrote it
+    quarantine_copy = cache_dir / QUARANTINE_FILES["trades"]
+
+    if (_cache_is_fresh(cache_dir, manifest, source_path)
+            and manifest.get("validated", False) == validated
+            and manifest.get("deduped", validated) == deduped):
+        print("⚡ Trader data read from columnar cache:", cache_dir)
+        if validated:
+            validator.restore("trades", manifest["validation"], quarantine_copy)
+        return _read_columnar(cache_dir, columns, manifest)
+
+    trader_df = _clean_trader_frame(pd.read_csv(source_path), validator)
+
+    stat = os.stat(source_path)
+    meta = {
+        "source": {
+            "path": str(source_path.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": _hash_file(source_path),
+        },
+        "validated": validated,
+        "deduped": deduped,
+    }
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    quarantine_copy.unlink(missing_ok=True)
+    if validated:
+        meta["validation"] = validator.snapshot("trades")
+        quarantine = validator.quarantine_file("trades")
+        if quarantine is not None and quarantine.exists():
+            shutil.copy(quarantine, quarantine_copy)
+    _write_columnar(trader_df, cache_dir, meta=meta)
+    print("💾 Columnar cache written:", cache_dir)
+
+    return trader_df[columns]
+
+
+#sentiment classification
+def classify_sentiment(classification, value, fear_threshold=None, greed_threshold=None,
+                       extreme=False, extreme_fear_threshold=None,
+                       extreme_greed_threshold=None):
+
+    fear_threshold = FEAR_THRESHOLD if fear_threshold is None else fear_threshold
+    greed_threshold = GREED_THRESHOLD if greed_threshold is None else greed_threshold
+    if extreme_fear_threshold is None:
+        extreme_fear_threshold = EXTREME_FEAR_THRESHOLD
+    if extreme_greed_threshold is None:
+        extreme_greed_threshold = EXTREME_GREED_THRESHOLD
+
+    # the labels only take a handful of distinct values, so the substring
+    # checks run on the uniques and are broadcast back through the codes
+    codes, uniques = pd.factorize(classification)
+    uniques = pd.Series(uniques, dtype=object).astype(str)
+    is_fear = uniques.str.contains("Fear", regex=False).to_numpy()
+    is_greed = uniques.str.contains("Greed", regex=False).to_numpy()
+    is_extreme = uniques.str.contains("Extreme", regex=False).to_numpy()
+
+    has_label = codes >= 0
+    fear = has_label & is_fear.take(codes, mode="clip")
+    greed = has_label & is_greed.take(codes, mode="clip")
+    extreme_label = has_label & is_extreme.take(codes, mode="clip")
+
+    value = pd.to_numeric(value, errors="coerce").to_numpy(dtype=float)
+
+    if extreme:
+        labels = ["Extreme Fear", "Fear", "Neutral", "Greed", "Extreme Greed"]
+        conditions = [
+            fear & extreme_label, fear,
+            greed & extreme_label, greed,
+            value < extreme_fear_threshold, value < fear_threshold,
+            value > extreme_greed_threshold, value > greed_threshold,
+        ]
+        choices = [
+            "Extreme Fear", "Fear", "Extreme Greed", "Greed",
+            "Extreme Fear", "Fear", "Extreme Greed", "Greed",
+        ]
+    else:
+        labels = ["Fear", "Greed", "Neutral"]
+        conditions = [fear, greed, value < fear_threshold, value > greed_threshold]
+        choices = ["Fear", "Greed", "Fear", "Greed"]
+
+    result = np.select(conditions, choices, default="Neutral")
+
+    return pd.Series(
+        pd.Categorical(result, categories=labels),
+        index=getattr(classification, "index", None),
+    )
+
+
+#sentiment alignment
+def _sentiment_index(sentiment_df):
+    # one reading per day, sorted, so lookups are a searchsorted away
+    return (
+        sentiment_df[["date", "sentiment_binary"]]
+        .sort_values("date", kind="stable")
+        .drop_duplicates("date", keep="last")
+    )
+
+
+def _sentiment_positions(trader_df, dates, join=None, lag=None, tolerance=None):
+
+    join = join or SENTIMENT_JOIN
+    lag = pd.Timedelta(SENTIMENT_LAG if lag is None else lag)
+    if join not in ("date", "asof"):
+        raise ValueError(f"Unknown sentiment join '{join}' (expected 'date' or 'asof')")
+
+    if not len(dates):
+        # no readings: nothing matches and the caller reports the empty merge
+        return np.zeros(len(trader_df), dtype=np.int64), np.zeros(len(trader_df), dtype=bool)
+
+    if join == "date":
+        # same IST calendar day as the trade, optionally shifted back by lag
+        if lag == pd.Timedelta(0):
+            keys = trader_df["trade_date"].to_numpy(dtype="datetime64[ns]")
+        else:
+            keys = (trader_df["trade_time"] - lag).dt.normalize().to_numpy(dtype="datetime64[ns]")
+
+        # readings are daily, so a dense day-offset table replaces a binary search
+        day = np.timedelta64(1, "D")
+        span = int((dates[-1] - dates[0]) // day) + 1
+        lookup = np.full(span, -1, dtype=np.int64)
+        lookup[(dates - dates[0]) // day] = np.arange(len(dates))
+
+        valid = ~np.isnat(keys)
+        offsets = np.zeros(len(keys), dtype=np.int64)
+        offsets[valid] = (keys[valid] - dates[0]) // day
+        valid &= (offsets >= 0) & (offsets < span)
+        pos = np.where(valid, lookup[np.clip(offsets, 0, span - 1)], -1)
+        return np.maximum(pos, 0), pos >= 0
+
+    # latest reading published at or before (trade time - lag), in UTC
+    tolerance = pd.Timedelta(SENTIMENT_TOLERANCE if tolerance is None else tolerance)
+    # timestamps are minute-resolution, so only the distinct values are
+    # localized and looked up, then broadcast back through the codes
+    codes, uniques = pd.factorize(trader_df["trade_time"])
+    uniques_utc = (
+        pd.DatetimeIndex(uniques)
+        .tz_localize(TRADE_TIMEZONE, ambiguous="NaT", nonexistent="NaT")
+        .tz_convert("UTC")
+        .tz_localize(None)
+    )
+    keys = (uniques_utc - lag).to_numpy(dtype="datetime64[ns]")
+    pos = np.searchsorted(dates, keys, side="right") - 1
+    matched = (pos >= 0) & ~np.isnat(keys)
+    pos = np.maximum(pos, 0)
+    matched &= keys - dates[pos] <= tolerance.to_timedelta64()
+
+    has_time = codes >= 0
+    return pos.take(codes, mode="clip"), has_time & matched.take(codes, mode="clip")
+
+
+def align_sentiment(trader_df, sentiment_df, join=None, lag=None, tolerance=None, labels=None):
+
+    index = _sentiment_index(sentiment_df)
+    dates = index["date"].to_numpy(dtype="datetime64[ns]")
+    pos, matched = _sentiment_positions(trader_df, dates, join, lag, tolerance)
+
+    keep = matched
+    if labels is not None:
+        keep = matched.copy()
+        keep[matched] = index["sentiment_binary"].isin(labels).to_numpy()[pos[matched]]
+
+    # trades keep their file order; one take builds the aligned frame
+    rows = np.flatnonzero(keep)
+    aligned = trader_df.take(rows)
+    aligned.index = pd.RangeIndex(len(aligned))
+    aligned["date"] = dates[pos[rows]]
+    aligned["sentiment_binary"] = index["sentiment_binary"].iloc[pos[rows]].to_numpy()
+
+    return aligned, int(len(matched) - matched.sum())
+
+
+#loading and cleaning
+def join_sentiment(trader_df, sentiment_df, join=None, lag=None, verbose=False):
+
+    merged_df, unmatched = align_sentiment(
+        trader_df, sentiment_df, join, lag, labels=["Fear", "Greed"]
+    )
+
+    if verbose and unmatched:
+        print(f"⚠️  Trades without a sentiment reading (dropped): {unmatched:,}")
+
+    return merged_df
+
+
+def load_sentiment_data(data_path=None, validator=None):
+
+    sentiment_df = pd.read_csv(_data_file(SENTIMENT_FILE, data_path))
+
+    if validator is not None:
+        dates = pd.to_datetime(sentiment_df["date"], errors="coerce")
+        values = pd.to_numeric(sentiment_df["value"], errors="coerce")
+        keep = validator.apply("sentiment", sentiment_df, {
+            "unparseable_date": dates.isna().to_numpy(),
+            # a blank value is not out of range; the reading still has its label
+            "value_out_of_range": (values.notna() & ~values.between(*SENTIMENT_VALUE_RANGE)).to_numpy(),
+            "missing_classification": sentiment_df["classification"].isna().to_numpy(),
+        })
+        sentiment_df = sentiment_df[keep].assign(date=dates[keep], value=values[keep])
+
+    sentiment_df["date"] = pd.to_datetime(sentiment_df["date"]).dt.normalize()
+    sentiment_df = sentiment_df.dropna(subset=["classification"])
+    sentiment_df["classification"] = (
+        sentiment_df["classification"].str.strip().str.title()
+    )
+
+    sentiment_df["sentiment_binary"] = classify_sentiment(
+        sentiment_df["classification"], sentiment_df["value"]
+    )
+
+    print("✅ Sentiment data loaded:", sentiment_df.shape)
+    print("   Date range:", sentiment_df["date"].min(), "→", sentiment_df["date"].max())
+    print("   Sentiment distribution:")
+    print(sentiment_df["sentiment_binary"].value_counts())
+
+    return sentiment_df
+
+
+def load_and_clean_data(data_path=None, use_cache=None, join=None, lag=None, validator=None):
+
+    print("=" * 80)
+    print("LOADING AND CLEANING DATA")
+    print("=" * 80)
+
+    sentiment_df = load_sentiment_data(data_path, validator)
+
+    trader_df = load_trader_data(data_path=data_path, use_cache=use_cache, validator=validator)
+
+    print("✅ Trader data loaded:", trader_df.shape)
+    print("   Date range:", trader_df["trade_date"].min(), "→", trader_df["trade_date"].max())
+    print("   Unique traders:", trader_df["account"].nunique())
+    print("   Unique coins:", trader_df["coin"].nunique())
+
+    # ---------- Merge ----------
+    merged_df = join_sentiment(trader_df, sentiment_df, join, lag, verbose=True)
+
+    print("✅ Merged dataset:", merged_df.shape)
+    print("   Final sentiment distribution:")
+    print(merged_df["sentiment_binary"].value_counts())
+
+    if merged_df.empty:
+        raise ValueError("Merged dataframe is EMPTY. Date mismatch issue.")
+
+    return merged_df, sentiment_df
+
+#dtype normalization
+def _memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def compact_dtypes(merged_df, category_ratio=0.5):
+
+    print("\n" + "=" * 80)
+    print("COMPACTING DTYPES")
+    print("=" * 80)
+
+    before_mb = _memory_mb(merged_df)
+
+    # "date" is the sentiment-side copy of trade_date
+    frame = merged_df.drop(columns=["date"], errors="ignore").reset_index(drop=True)
+
+    # sorted codes keep groupby output in the same order as the hex strings
+    codes, accounts = pd.factorize(frame["account"], sort=True)
+    frame["account"] = codes.astype(np.int32)
+    account_lookup = pd.Index(accounts, name="account")
+
+    for name in frame.columns:
+        col = frame[name]
+        if name == "account":
+            continue
+        if pd.api.types.is_object_dtype(col):
+            if col.nunique() <= category_ratio * len(col):
+                frame[name] = col.astype("category")
+        elif pd.api.types.is_integer_dtype(col):
+            frame[name] = pd.to_numeric(col, downcast="integer")
+        elif pd.api.types.is_float_dtype(col) and name not in MEASURE_COLUMNS:
+            # only downcast when every value survives the round trip
+            narrow = col.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(np.float64), col.to_numpy(), equal_nan=True):
+                frame[name] = narrow
+
+    after_mb = _memory_mb(frame)
+    print(f"✅ Memory: {before_mb:,.1f} MB → {after_mb:,.1f} MB "
+          f"({before_mb / max(after_mb, 1e-9):.1f}x smaller)")
+    print(f"   Accounts interned: {len(account_lookup):,}")
+
+    return frame, account_lookup
+
+
+def decode_accounts(df, account_lookup):
+    df = df.copy()
+    df["account"] = account_lookup.take(df["account"].to_numpy())
+    return df
+
+
+#METRICS
+def create_daily_metrics(merged_df, with_state=False):
+
+    print("\n" + "=" * 80)
+    print("CREATING DAILY METRICS")
+    print("=" * 80)
+
+    result = _daily_metrics_frame(merged_df, with_state)
+
+    print("✅ Daily metrics created:", (result[0] if with_state else result).shape)
+
+    return result
+
+
+def _daily_metrics_frame(merged_df, with_state=False):
+
+    # boolean flags are precomputed so every column comes out of one agg
+    frame = merged_df.assign(
+        is_buy=merged_df["side"] == "BUY",
+        is_win=merged_df["closed_pnl"] > 0,
+    )
+    aggregations = {
+        "daily_pnl": ("closed_pnl", "sum"),
+        "avg_pnl_per_trade": ("closed_pnl", "mean"),
+        "pnl_volatility": ("closed_pnl", "std"),
+        "num_trades": ("closed_pnl", "count"),
+        "total_volume": ("size_usd", "sum"),
+        "avg_trade_size": ("size_usd", "mean"),
+        "total_fees": ("fee", "sum"),
+        "buy_ratio": ("is_buy", "mean"),
+        "win_rate": ("is_win", "mean"),
+    }
+    if with_state:
+        # the --append sufficient statistics come out of the same groupby
+        frame["pnl_sq"] = frame["closed_pnl"] ** 2
+        aggregations.update(pnl_sumsq=("pnl_sq", "sum"), buys=("is_buy", "sum"),
+                            wins=("is_win", "sum"))
+
+    grouped = frame.groupby(DAILY_KEYS, observed=True).agg(**aggregations)
+    daily_metrics = grouped[list(aggregations)[:9]].reset_index()
+
+    daily_metrics["pnl_volatility"] = daily_metrics["pnl_volatility"].fillna(0)
+    daily_metrics["net_pnl"] = (
+        daily_metrics["daily_pnl"] - daily_metrics["total_fees"]
+    )
+
+    if not with_state:
+        return daily_metrics
+    # same columns, in the same order, as _partial_stats
+    daily_stats = pd.DataFrame({
+        "pnl_sum": grouped["daily_pnl"],
+        "pnl_sumsq": grouped["pnl_sumsq"],
+        "n": grouped["num_trades"],
+        "size_sum": grouped["total_volume"],
+        "fee_sum": grouped["total_fees"],
+        "buys": grouped["buys"],
+        "wins": grouped["wins"],
+    })
+    return daily_metrics, daily_stats
+
+#trader segmentaion
+def create_trader_segments(merged_df):
+    
+    print("\n" + "=" * 80)
+    print("CREATING TRADER SEGMENTS")
+    print("=" * 80)
+
+    return assign_trader_segments(_trader_profile_frame(merged_df))
+
+
+def _trader_profile_frame(merged_df):
+
+    #overall trader profiles, win rate included in the same pass
+    trader_profile = (
+        merged_df
+        .assign(is_win=merged_df["closed_pnl"] > 0)
+        .groupby("account")
+        .agg(
+            total_pnl=("closed_pnl", "sum"),
+            avg_pnl=("closed_pnl", "mean"),
+            pnl_std=("closed_pnl", "std"),
+            avg_size=("size_usd", "mean"),
+            total_fees=("fee", "sum"),
+            total_trades=("trade_date", "count"),
+            overall_win_rate=("is_win", "mean"),
+        )
+        .reset_index()
+    )
+    trader_profile["net_profit"] = trader_profile["total_pnl"] - trader_profile["total_fees"]
+
+    return trader_profile
+
+
+#segmentation
+class QuantileSketch:
+    # KLL-style mergeable quantile sketch: level h holds items of weight 2**h,
+    # and a full level is sorted and every other item promoted upwards
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            while len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                keep = items[len(items) - len(items) % 2:]
+                promoted = items[self._rng.integers(2):len(items) - len(keep):2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = keep
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level_items), 2 ** level) for level, level_items in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind="stable")
+        ranks = np.cumsum(weights[order])
+        targets = np.asarray(q) * ranks[-1]
+        positions = np.searchsorted(ranks, targets, side="left").clip(0, len(items) - 1)
+        return items[order][positions]
+
+
+#column -> (source metric, quantile cut points, labels from low to high)
+SEGMENT_BINS = {
+    "volume_segment": ("avg_size", [0.5], ["Low Volume", "High Volume"]),
+    "frequency_segment": ("total_trades", [0.75], ["Infrequent", "Frequent"]),
+}
+
+#sharded / spilled runs: build one KLL sketch of this size per shard or partition
+#and take segment thresholds from their merge instead of exact quantiles
+SEGMENT_SKETCH_K = None
+
+
+def segment_sketches(trader_profile, sketch_k, bins=None):
+    # one sketch per segmentation metric over the accounts of one shard
+    bins = SEGMENT_BINS if bins is None else bins
+    return {
+        metric: QuantileSketch(sketch_k).update(trader_profile[metric])
+        for metric, _, _ in bins.values()
+    }
+
+
+def merge_sketches(sketch_sets):
+    merged = {}
+    for sketches in sketch_sets:
+        for metric, sketch in sketches.items():
+            merged[metric] = merged[metric].merge(sketch) if metric in merged else sketch
+    return merged
+
+
+def segment_thresholds(values, quantiles, sketch=None):
+    if sketch is not None:
+        return sketch.quantile(quantiles)
+    # same linear interpolation as Series.quantile
+    return np.nanquantile(np.asarray(values, dtype="float64"), quantiles)
+
+
+def quantile_segments(values, thresholds, labels):
+    # a value equal to a cut point belongs to the bin above it
+    bins = np.searchsorted(thresholds, np.asarray(values), side="right")
+    return np.asarray(labels, dtype=object)[bins]
+
+
+def assign_trader_segments(trader_profile, bins=None, sketches=None):
+
+    bins = SEGMENT_BINS if bins is None else bins
+    sketches = sketches or {}
+
+    thresholds = {}
+    for column, (metric, quantiles, labels) in bins.items():
+        if len(labels) != len(quantiles) + 1:
+            raise ValueError(f"{column}: {len(quantiles)} cut points need {len(quantiles) + 1} labels")
+        thresholds[column] = segment_thresholds(trader_profile[metric], quantiles,
+                                                sketches.get(metric))
+        trader_profile[column] = quantile_segments(trader_profile[metric], thresholds[column], labels)
+
+    consistent = (trader_profile["net_profit"] > 0) & (trader_profile["overall_win_rate"] > 0.5)
+    trader_profile["performance_segment"] = np.where(consistent, "Consistent Winner", "Inconsistent")
+
+    sketch_k = next(iter(sketches.values())).k if sketches else None
+    print(f"✅ Trader segments created" + (f" (merged KLL sketches, k={sketch_k})" if sketch_k else ""))
+    for i, (column, (metric, _, _)) in enumerate(bins.items(), start=1):
+        cuts = ", ".join(f"{value:,.2f}" for value in thresholds[column])
+        print(f"\n{i}. {column.replace('_', ' ').title()}s ({metric} thresholds: {cuts}):")
+        print(trader_profile[column].value_counts())
+    print(f"\n{len(bins) + 1}. Performance Segments:")
+    print(trader_profile["performance_segment"].value_counts())
+    
+    return trader_profile
+
+
+#streaming
+def _partial_stats(merged_df, keys):
+    # mergeable sufficient statistics: every column is additive across chunks
+    frame = merged_df.assign(
+        pnl_sq=merged_df["closed_pnl"] ** 2,
+        is_buy=merged_df["side"] == "BUY",
+        is_win=merged_df["closed_pnl"] > 0,
+    )
+
+    return frame.groupby(keys, observed=True).agg(
+        pnl_sum=("closed_pnl", "sum"),
+        pnl_sumsq=("pnl_sq", "sum"),
+        n=("closed_pnl", "count"),
+        size_sum=("size_usd", "sum"),
+        fee_sum=("fee", "sum"),
+        buys=("is_buy", "sum"),
+        wins=("is_win", "sum"),
+    )
+
+
+def _combine_partials(partials):
+    combined = pd.concat(partials)
+    levels = list(range(combined.index.nlevels))
+    return combined.groupby(level=levels, observed=True).sum()
+
+
+def _stats_std(stats):
+    n = stats["n"]
+    mean = stats["pnl_sum"] / n
+    variance = (stats["pnl_sumsq"] - stats["pnl_sum"] * mean) / (n - 1)
+    return np.sqrt(variance.clip(lower=0)).where(n > 1)
+
+
+def _finalize_daily(stats):
+
+    n = stats["n"]
+    daily_metrics = pd.DataFrame({
+        "daily_pnl": stats["pnl_sum"],
+        "avg_pnl_per_trade": stats["pnl_sum"] / n,
+        "pnl_volatility": _stats_std(stats).fillna(0),
+        "num_trades": n,
+        "total_volume": stats["size_sum"],
+        "avg_trade_size": stats["size_sum"] / n,
+        "total_fees": stats["fee_sum"],
+        "buy_ratio": stats["buys"] / n,
+        "win_rate": stats["wins"] / n,
+    }).reset_index()
+
+    daily_metrics["net_pnl"] = (
+        daily_metrics["daily_pnl"] - daily_metrics["total_fees"]
+    )
+
+    return daily_metrics
+
+
+def _finalize_profile(stats):
+
+    n = stats["n"]
+    trader_profile = pd.DataFrame({
+        "total_pnl": stats["pnl_sum"],
+        "avg_pnl": stats["pnl_sum"] / n,
+        "pnl_std": _stats_std(stats),
+        "avg_size": stats["size_sum"] / n,
+        "total_fees": stats["fee_sum"],
+        "total_trades": n,
+        "overall_win_rate": stats["wins"] / n,
+    }).reset_index()
+
+    trader_profile["net_profit"] = trader_profile["total_pnl"] - trader_profile["total_fees"]
+
+    return trader_profile
+
+
+def _stream_partials(sentiment_df, keys, chunk_size=None, data_path=None, join=None, lag=None,
+                     bucket=None, validator=None):
+
+    chunk_size = chunk_size or CHUNK_SIZE
+
+    # peak memory is one chunk plus the accumulator, which only grows with
+    # the number of groups
+    accumulator = None
+    rows_read = 0
+    rows_merged = 0
+
+    for chunk in pd.read_csv(_data_file(TRADER_FILE, data_path), chunksize=chunk_size):
+        chunk = _clean_trader_frame(chunk, validator)
+        merged_chunk = join_sentiment(chunk, sentiment_df, join, lag)
+
+        rows_read += len(chunk)
+        rows_merged += len(merged_chunk)
+
+        if bucket:
+            merged_chunk = _with_buckets(merged_chunk, bucket)
+        chunk_stats = _partial_stats(merged_chunk, keys)
+        if accumulator is None:
+            accumulator = chunk_stats
+        else:
+            accumulator = _combine_partials([accumulator, chunk_stats])
+
+    if accumulator is None or accumulator.empty:
+        raise ValueError("Merged dataframe is EMPTY. Date mismatch issue.")
+
+    print(f"✅ Streamed {rows_read:,} trades in chunks of {chunk_size:,}")
+    print(f"   Trades matched to Fear/Greed days: {rows_merged:,}")
+
+    return accumulator
+
+
+def stream_daily_metrics(sentiment_df, chunk_size=None, data_path=None, join=None, lag=None,
+                         bucket=None, validator=None):
+
+    print("\n" + "=" * 80)
+    print("STREAMING DAILY METRICS")
+    print("=" * 80)
+
+    # with a bucket width the chunks accumulate at bucket grain and the daily
+    # stats are summed from those, so intraday costs no extra pass; the
+    # accumulated stats are returned at that grain
+    keys = INTRADAY_KEYS if bucket else DAILY_KEYS
+    stats = _stream_partials(sentiment_df, keys, chunk_size, data_path, join, lag, bucket,
+                             validator)
+    daily_stats = stats.groupby(level=DAILY_KEYS, observed=True).sum() if bucket else stats
+
+    daily_metrics = _finalize_daily(daily_stats)
+    print("✅ Daily metrics created:", daily_metrics.shape)
+
+    account_stats = daily_stats.groupby(level="account").sum()
+    trader_profile = assign_trader_segments(_finalize_profile(account_stats))
+
+    return daily_metrics, trader_profile, stats
+
+
+#incremental updates
+def _load_state(name, output_path=None):
+    state_dir = _output_file(STATE_DIR, output_path) / name
+    manifest = _read_manifest(state_dir)
+    if manifest is None:
+        return None, manifest
+    if "parts" in manifest:
+        state = pd.concat([_read_columnar(state_dir / part) for part in manifest["parts"]],
+                          ignore_index=True)
+    else:
+        state = _read_columnar(state_dir, manifest=manifest)
+    return state.set_index(manifest["keys"]), manifest
+
+
+def _save_state(name, stats, meta, output_path=None):
+    state_dir = _output_file(STATE_DIR, output_path) / name
+    shutil.rmtree(state_dir, ignore_errors=True)
+    meta = dict(meta, keys=list(stats.index.names))
+    _write_columnar(stats.reset_index(), state_dir, meta=meta)
+
+
+def _save_state_parts(name, parts_dir, parts, keys, meta, output_path=None):
+    # parts written elsewhere (one per spill partition) are moved in whole,
+    # so the state is never held in memory at once
+    state_dir = _output_file(STATE_DIR, output_path) / name
+    shutil.rmtree(state_dir, ignore_errors=True)
+    state_dir.mkdir(parents=True)
+    for part in parts:
+        os.replace(Path(parts_dir) / part, state_dir / part)
+    _write_manifest(state_dir, dict(meta, version=CACHE_VERSION, keys=keys, parts=list(parts)))
+
+
+def _decode_state(stats, account_lookup):
+    if account_lookup is None:
+        return stats
+    level = stats.index.names.index("account")
+    accounts = pd.Index(account_lookup).take(stats.index.levels[level])
+    return stats.set_axis(stats.index.set_levels(accounts, level=level))
+
+
+def _state_settings(join=None, lag=None):
+    # how trades were matched to sentiment; an append has to match them the
+    # same way or its trader-days would not line up with the saved ones
+    return {"sentiment": [join or SENTIMENT_JOIN, str(pd.Timedelta(lag or SENTIMENT_LAG)),
+                          str(pd.Timedelta(SENTIMENT_TOLERANCE)), TRADE_TIMEZONE,
+                          FEAR_THRESHOLD, GREED_THRESHOLD]}
+
+
+def save_metrics_state(daily_stats, output_path=None, join=None, lag=None):
+    # a full run seeds the --append history; whatever was applied before is
+    # part of its input now
+    meta = dict(_state_settings(join, lag), applied=[])
+    _save_state("daily", daily_stats, meta, output_path)
+    _save_state("account", daily_stats.groupby(level="account").sum(), meta, output_path)
+
+
+def _has_exports(name, output_path=None):
+    return any(_output_file(name + suffix, output_path).exists() for suffix in EXPORT_SUFFIXES.values())
+
+
+def _apply_delta(state, delta):
+    # only the rows touched by the delta are re-added; untouched groups are
+    # carried over as they are
+    if state is None:
+        return delta.sort_index()
+
+    updated = delta.add(state.reindex(delta.index), fill_value=0)
+    untouched = state[~state.index.isin(delta.index)]
+    merged = pd.concat([untouched, updated]).sort_index()
+    return merged.astype({"n": "int64", "buys": "int64", "wins": "int64"})
+
+
+def update_incremental(new_trades_file, data_path=None, output_path=None, export_format=None,
+                       validate=None, join=None, lag=None):
+
+    print("\n" + "=" * 80)
+    print("INCREMENTAL UPDATE")
+    print("=" * 80)
+
+    daily_state, manifest = _load_state("daily", output_path)
+    account_state, _ = _load_state("account", output_path)
+    applied = manifest["applied"] if manifest else []
+
+    delta_hash = _hash_file(new_trades_file)
+    if delta_hash in applied:
+        print(f"⚠️  {new_trades_file} was already applied, nothing to do")
+        return None, None
+
+    if daily_state is None:
+        if _has_exports("daily_trader_metrics", output_path):
+            # the exports would be overwritten with the new trades alone
+            raise ValueError(
+                f"{_output_file(STATE_DIR, output_path)} has no saved state for the existing "
+                "outputs; re-run the metrics stage before appending"
+            )
+        print("   No saved state yet, starting from an empty history")
+
+    settings = _state_settings(join, lag)
+    if manifest is not None and manifest.get("sentiment") != settings["sentiment"]:
+        raise ValueError(
+            f"The saved state matched trades to sentiment with {manifest.get('sentiment')}, "
+            f"this append with {settings['sentiment']}; pass the same --sentiment-join/--sentiment-lag "
+            "or re-run the metrics stage"
+        )
+
+    validator = sentiment_validator = None
+    if VALIDATE if validate is None else validate:
+        # rejected trades join the full run's quarantine; sentiment was
+        # quarantined by that run already
+        validator = DataValidator(output_path or OUTPUT_PATH, append=True)
+        sentiment_validator = DataValidator()
+
+    sentiment_df = load_sentiment_data(data_path, sentiment_validator)
+    new_trades = _clean_trader_frame(pd.read_csv(new_trades_file), validator)
+    if validator is not None:
+        validator.write_report(output_path)
+    merged_delta = join_sentiment(new_trades, sentiment_df, join, lag)
+    print(f"✅ New trades: {len(new_trades):,} ({len(merged_delta):,} on Fear/Greed days)")
+
+    delta = _partial_stats(merged_delta, DAILY_KEYS)
+    account_delta = delta.groupby(level="account").sum()
+
+    daily_state = _apply_delta(daily_state, delta)
+    account_state = _apply_delta(account_state, account_delta)
+
+    meta = dict(settings, applied=applied + [delta_hash])
+    _save_state("daily", daily_state, meta, output_path)
+    _save_state("account", account_state, meta, output_path)
+
+    print(f"   Updated {len(delta):,} trader-days across {len(account_delta):,} accounts")
+
+    daily_metrics = _finalize_daily(daily_state)
+    trader_profile = assign_trader_segments(_finalize_profile(account_state))
+
+    export_format = _export_format(export_format)
+    saved = write_table(daily_metrics, "daily_trader_metrics", output_path, export_format,
+                        EXPORT_PARTITIONS)
+    print(f"✅ Saved: {saved}")
+    saved = write_table(trader_profile, "trader_profiles", output_path, export_format)
+    print(f"✅ Saved: {saved}")
+
+    # rolling windows only look back, so days before the delta keep their values
+    if len(delta):
+        extend_rolling_metrics(
+            daily_metrics, delta.index.get_level_values("trade_date").min(), output_path
+        )
+
+    return daily_metrics, trader_profile
+
+
+#sharded execution
+_SHARD_SOURCE = None
+
+
+def _shard_job(job):
+    # forked workers slice the parent's frame; otherwise the shard is shipped
+    shard, sketch_k = job
+    shard_df = _SHARD_SOURCE.take(shard) if isinstance(shard, np.ndarray) else shard
+    daily_metrics, daily_stats = _daily_metrics_frame(shard_df, with_state=True)
+    trader_profile = _trader_profile_frame(shard_df)
+    sketches = segment_sketches(trader_profile, sketch_k) if sketch_k else {}
+    return daily_metrics, daily_stats, trader_profile, sketches
+
+
+def create_sharded_metrics(merged_df, n_shards, workers=None, sketch_k=None):
+
+    global _SHARD_SOURCE
+    sketch_k = SEGMENT_SKETCH_K if sketch_k is None else sketch_k
+
+    print("\n" + "=" * 80)
+    print(f"CREATING DAILY METRICS AND SEGMENTS ({n_shards} SHARDS)")
+    print("=" * 80)
+
+    # every account lands in exactly one shard, so per-shard groupbys are final
+    accounts = merged_df["account"].to_numpy()
+    shard_ids = pd.util.hash_array(accounts) % np.uint64(n_shards)
+    order = np.argsort(shard_ids, kind="stable")
+    bounds = np.searchsorted(shard_ids[order], np.arange(n_shards + 1, dtype=np.uint64))
+    jobs = [order[start:stop] for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        if multiprocessing.get_start_method() == "fork":
+            _SHARD_SOURCE = merged_df
+        else:
+            jobs = [merged_df.take(rows) for rows in jobs]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_shard_job, [(job, sketch_k) for job in jobs]))
+        finally:
+            _SHARD_SOURCE = None
+    else:
+        results = [_shard_job((merged_df.take(rows), sketch_k)) for rows in jobs]
+
+    daily_metrics = (
+        pd.concat([daily for daily, _, _, _ in results])
+        .sort_values(DAILY_KEYS)
+        .reset_index(drop=True)
+    )
+    # the --append state, built by the workers in the same pass as the metrics
+    daily_stats = pd.concat([stats for _, stats, _, _ in results]).sort_index()
+    trader_profile = (
+        pd.concat([profile for _, _, profile, _ in results])
+        .sort_values("account")
+        .reset_index(drop=True)
+    )
+
+    print(f"✅ {len(jobs)} shards processed on {workers} worker(s)")
+    print("✅ Daily metrics created:", daily_metrics.shape)
+
+    # segment thresholds (median avg_size, 75th pct of total_trades) are
+    # global: exact over the concatenated profiles, or from the shards' merged sketches
+    sketches = merge_sketches(sketches for _, _, _, sketches in results)
+    return daily_metrics, assign_trader_segments(trader_profile, sketches=sketches), daily_stats
+
+
+#out-of-core backend
+class SpilledTable:
+    # a frame kept on disk as columnar partitions; concatenating them in order
+    # gives exactly the frame the pandas backend builds in memory
+
+    def __init__(self, directory, partitions):
+        self.directory = Path(directory)
+        self.partitions = partitions
+
+    def __len__(self):
+        return sum(_read_manifest(self.directory / name)["rows"] for name in self.partitions)
+
+    @property
+    def shape(self):
+        return len(self), len(_read_manifest(self.directory / self.partitions[0])["columns"])
+
+    def read(self, partition, columns=None):
+        return _read_columnar(self.directory / partition, columns)
+
+    def parts(self, columns=None):
+        for partition in self.partitions:
+            yield self.read(partition, columns)
+
+    def to_pandas(self, columns=None):
+        return pd.concat(list(self.parts(columns)), ignore_index=True)
+
+
+def _spill_partition(prefix):
+    # accounts are range-partitioned on their leading characters, so partitions
+    # in prefix order hold accounts in sorted order and never interleave; the
+    # hex of the UTF-8 prefix sorts the same way and is safe as a file name
+    return prefix.encode().hex()
+
+
+def spill_trades(sentiment_df, spill_dir, chunk_size=None, data_path=None, join=None, lag=None,
+                 validator=None):
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    trades_dir = Path(spill_dir) / "trades"
+    shutil.rmtree(trades_dir, ignore_errors=True)
+
+    rows_read = rows_merged = 0
+    partitions = set()
+    reader = pd.read_csv(_data_file(TRADER_FILE, data_path), chunksize=chunk_size)
+    for number, chunk in enumerate(reader):
+        chunk = _clean_trader_frame(chunk, validator)
+        merged_chunk = join_sentiment(chunk, sentiment_df, join, lag)[SPILL_COLUMNS]
+
+        rows_read += len(chunk)
+        rows_merged += len(merged_chunk)
+
+        # one run per chunk and partition; runs keep the file's row order
+        prefixes = merged_chunk["account"].str[:SPILL_PREFIX_CHARS]
+        for prefix, piece in merged_chunk.groupby(prefixes, sort=False):
+            partition = _spill_partition(prefix)
+            _write_columnar(piece, trades_dir / partition / f"run-{number:06d}")
+            partitions.add(partition)
+
+    if not partitions:
+        raise ValueError("Merged dataframe is EMPTY. Date mismatch issue.")
+
+    print(f"✅ Spilled {rows_merged:,} of {rows_read:,} trades into {len(partitions):,} "
+          f"account partitions under {trades_dir}")
+    return sorted(partitions)
+
+
+def _spill_job(job):
+    trades_dir, daily_dir, state_dir, partition, sketch_k = job
+    runs = sorted((trades_dir / partition).iterdir())
+    merged_df = pd.concat([_read_columnar(run) for run in runs], ignore_index=True)
+
+    daily_metrics, daily_stats = _daily_metrics_frame(merged_df, with_state=True)
+    _write_columnar(daily_metrics, daily_dir / partition)
+    _write_columnar(daily_stats.reset_index(), state_dir / partition)
+    trader_profile = _trader_profile_frame(merged_df)
+    sketches = segment_sketches(trader_profile, sketch_k) if sketch_k else {}
+    return trader_profile, daily_stats.groupby(level="account").sum(), sketches
+
+
+def create_spilled_metrics(sentiment_df, spill_dir=None, chunk_size=None, data_path=None,
+                           join=None, lag=None, workers=None, sketch_k=None, validator=None):
+
+    print("\n" + "=" * 80)
+    print("CREATING DAILY METRICS AND SEGMENTS (OUT-OF-CORE)")
+    print("=" * 80)
+
+    spill_dir = Path(spill_dir)
+    sketch_k = SEGMENT_SKETCH_K if sketch_k is None else sketch_k
+    partitions = spill_trades(sentiment_df, spill_dir, chunk_size, data_path, join, lag, validator)
+
+    # each partition holds whole accounts, so its groupbys are final; peak
+    # memory is one partition per worker
+    # the daily --append state is left per partition under spill_dir/state
+    daily_dir, state_dir = spill_dir / "daily", spill_dir / "state"
+    for directory in [daily_dir, state_dir]:
+        shutil.rmtree(directory, ignore_errors=True)
+    jobs = [(spill_dir / "trades", daily_dir, state_dir, partition, sketch_k)
+            for partition in partitions]
+    workers = min(workers or SPILL_WORKERS or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_spill_job, jobs))
+    else:
+        results = [_spill_job(job) for job in jobs]
+    shutil.rmtree(spill_dir / "trades")
+
+    daily_metrics = SpilledTable(daily_dir, partitions)
+    trader_profile = pd.concat([profile for profile, _, _ in results], ignore_index=True)
+    account_stats = pd.concat([stats for _, stats, _ in results])
+    sketches = merge_sketches(sketches for _, _, sketches in results)
+
+    print(f"✅ {len(jobs):,} partitions processed on {workers} worker(s)")
+    print("✅ Daily metrics created:", daily_metrics.shape)
+
+    # the profile has one row per account and is the only frame held in
+    # memory; segment thresholds are global, so they are taken over all of it
+    return daily_metrics, assign_trader_segments(trader_profile, sketches=sketches), account_stats
+
+
+#rolling windows
+def _range_max(values, left, right):
+    # sparse table with only as many levels as the widest window needs
+    span = right - left + 1
+    table = [values]
+    for level in range(1, int(span.max()).bit_length() if len(span) else 1):
+        step = 1 << (level - 1)
+        nxt = table[-1].copy()
+        nxt[:-step] = np.maximum(table[-1][:-step], table[-1][step:])
+        table.append(nxt)
+    table = np.stack(table)
+
+    level = np.floor(np.log2(span)).astype(np.int64)
+    return np.maximum(table[level, left], table[level, right - (1 << level) + 1])
+
+
+def _window_moments(values, counted, start, stop, block=None):
+    # exact two-pass sum and sum of squared deviations over rows start..stop:
+    # each window's rows are summed directly and in order, so a window's
+    # values do not depend on how much history precedes it
+    block = block or ROLLING_BLOCK
+    lengths = stop - start + 1
+    ends = np.cumsum(lengths)
+    total = np.zeros(len(start))
+    spread = np.zeros(len(start))
+
+    lo = 0
+    while lo < len(start):
+        hi = max(int(np.searchsorted(ends, ends[lo] - lengths[lo] + block, side="right")), lo + 1)
+        n = lengths[lo:hi]
+        owner = np.repeat(np.arange(hi - lo), n)
+        members = np.repeat(start[lo:hi] - (np.cumsum(n) - n), n) + np.arange(n.sum())
+        in_window = counted[members]
+        x = values[members]
+
+        total[lo:hi] = np.bincount(owner, weights=x, minlength=hi - lo)
+        count = np.bincount(owner, weights=in_window, minlength=hi - lo)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = total[lo:hi] / count
+        deviations = np.where(in_window, x - mean[owner], 0.0)
+        spread[lo:hi] = np.bincount(owner, weights=deviations ** 2, minlength=hi - lo)
+        lo = hi
+
+    return total, spread
+
+
+def _rolling_days(daily_metrics):
+    # one row per (account, day); regime columns only count that regime's rows
+    sentiment = daily_metrics["sentiment_binary"].astype(str).to_numpy()
+    net_pnl = daily_metrics["net_pnl"].to_numpy()
+    trades = daily_metrics["num_trades"].to_numpy()
+    wins = (daily_metrics["win_rate"] * daily_metrics["num_trades"]).round().to_numpy()
+
+    columns = {
+        "account": daily_metrics["account"].to_numpy(),
+        "day": daily_metrics["trade_date"].to_numpy().astype("datetime64[D]").astype(np.int64),
+    }
+    for regime in ROLLING_REGIMES:
+        mask = np.ones(len(sentiment), dtype=bool) if regime == "All" else sentiment == regime
+        columns[f"pnl_{regime}"] = np.where(mask, net_pnl, 0.0)
+        columns[f"trades_{regime}"] = np.where(mask, trades, 0)
+        columns[f"wins_{regime}"] = np.where(mask, wins, 0.0)
+        columns[f"days_{regime}"] = mask.astype(np.int64)
+
+    days = pd.DataFrame(columns).groupby(["account", "day"], sort=True).sum().reset_index()
+    for regime in ROLLING_REGIMES:
+        days[f"days_{regime}"] = (days[f"days_{regime}"] > 0).astype(np.int64)
+    return days
+
+
+def rolling_metrics(daily_metrics, windows=None, since=None):
+
+    windows = windows or ROLLING_WINDOWS
+    days = _rolling_days(daily_metrics)
+
+    since_day = None
+    if since is not None:
+        # days before `since` keep their values, so only the history the widest
+        # window reaches back to is needed, plus one day per account as the
+        # equity level carried into it
+        since_day = np.datetime64(pd.Timestamp(since), "D").astype(np.int64)
+        reach = days["day"].to_numpy() > since_day - max(windows)
+        before = days[~reach]
+        carried_rows = before.index[~before["account"].duplicated(keep="last")]
+        days = days[reach | days.index.isin(carried_rows)].reset_index(drop=True)
+
+    codes = pd.factorize(days["account"])[0]
+    day = days["day"].to_numpy()
+    first_day = day.min() if len(day) else 0
+    stride = int(day.max() - first_day) + max(windows) + 1 if len(day) else 1
+    # accounts are laid out back to back, so one searchsorted finds every window start
+    key = codes.astype(np.int64) * stride + (day - first_day)
+
+    positions = np.arange(len(days))
+    account_start = np.searchsorted(codes, codes, side="left")
+    keep = np.ones(len(days), dtype=bool) if since_day is None else day >= since_day
+
+    def running_total(values):
+        return pd.Series(values).groupby(codes).cumsum().to_numpy()
+
+    results = []
+    for regime in ROLLING_REGIMES:
+        # per-account running totals; a count window is the difference of two
+        # of them, pnl and its variance are summed over the window directly
+        pnl_values = days[f"pnl_{regime}"].to_numpy()
+        in_regime = days[f"days_{regime}"].to_numpy() > 0
+        running = {
+            "pnl": running_total(pnl_values),
+            "trades": running_total(days[f"trades_{regime}"].to_numpy()),
+            "wins": running_total(days[f"wins_{regime}"].to_numpy()),
+            "days": running_total(days[f"days_{regime}"].to_numpy()),
+        }
+
+        for window in windows:
+            start = np.searchsorted(key, key - window + 1, side="left")
+            has_prev = start > account_start
+            prev = np.where(has_prev, start - 1, 0)
+
+            def window_sum(column):
+                return running[column] - np.where(has_prev, running[column][prev], 0)
+
+            active = window_sum("days")
+            trades = window_sum("trades")
+            pnl, spread = _window_moments(pnl_values, in_regime, start, positions)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = pnl / active
+                # spreads below the rounding noise of the mean are flat
+                # windows, not tiny volatility
+                spread = np.where(spread > active * (1e-12 * mean) ** 2, spread, 0.0)
+                std = np.sqrt(spread / (active - 1))
+                sharpe = np.where((active > 1) & (std > 0), mean / std, np.nan)
+                win_rate = np.where(trades > 0, window_sum("wins") / trades, np.nan)
+
+            # drawdown from the highest equity level inside the window,
+            # counting the level carried into it
+            equity = running["pnl"]
+            carried = np.where(has_prev, equity[prev], 0.0)
+            peak = np.maximum(_range_max(equity, start, positions), carried)
+
+            rows = keep & (active > 0)
+            results.append(pd.DataFrame({
+                "account": days["account"].to_numpy()[rows],
+                "trade_date": day[rows].astype("datetime64[D]").astype("datetime64[ns]"),
+                "window_days": window,
+                "regime": regime,
+                "active_days": active[rows],
+                "net_pnl": pnl[rows],
+                "win_rate": win_rate[rows],
+                "sharpe": sharpe[rows],
+                "drawdown": (peak - equity)[rows],
+            }))
+
+    rolling = pd.concat(results, ignore_index=True)
+    rolling["regime"] = pd.Categorical(rolling["regime"], categories=ROLLING_REGIMES)
+
+    return rolling.sort_values(
+        ["account", "trade_date", "window_days", "regime"], kind="stable"
+    ).reset_index(drop=True)
+
+
+def create_rolling_metrics(daily_metrics, output_path=None):
+
+    print("\n" + "=" * 80)
+    print("ROLLING METRICS")
+    print("=" * 80)
+
+    rolling = rolling_metrics(daily_metrics)
+    rolling.to_csv(_output_file(ROLLING_FILE, output_path), index=False)
+
+    windows = ", ".join(f"{window}d" for window in ROLLING_WINDOWS)
+    print(f"✅ Rolling {windows} windows x {len(ROLLING_REGIMES)} regimes:", rolling.shape)
+    print(f"✅ Saved: {ROLLING_FILE}")
+
+    return rolling
+
+
+def extend_rolling_metrics(daily_metrics, since, output_path=None):
+    # days from `since` onwards are recomputed against the trailing history;
+    # earlier rows of the saved file are kept as they are
+    path = _output_file(ROLLING_FILE, output_path)
+    if not path.exists():
+        return create_rolling_metrics(daily_metrics, output_path)
+
+    previous = pd.read_csv(path, parse_dates=["trade_date"])
+    previous = previous[previous["trade_date"] < pd.Timestamp(since)]
+    rolling = (
+        pd.concat([previous, rolling_metrics(daily_metrics, since=since)], ignore_index=True)
+        .sort_values(["account", "trade_date", "window_days", "regime"], kind="stable")
+        .reset_index(drop=True)
+    )
+    rolling.to_csv(path, index=False)
+
+    print(f"✅ Rolling metrics extended from {pd.Timestamp(since).date()}: {len(rolling):,} rows")
+    return rolling
+
+
+#equity curves
+def _account_time_order(codes, times):
+    # one stable argsort of a packed (account, tick) key is about twice as
+    # fast as lexsort; ticks are as coarse as the timestamps allow
+    ticks = times.astype(np.int64)
+    ticks = ticks - ticks.min() if len(ticks) else ticks
+    for unit in (60 * 10 ** 9, 10 ** 9):
+        if not (ticks % unit).any():
+            ticks = ticks // unit
+            break
+    span = int(ticks.max()) + 1 if len(ticks) else 1
+    if int(codes.max() if len(codes) else 0) + 1 > np.iinfo(np.int64).max // span:
+        return np.lexsort((times, codes))
+    return np.argsort(codes.astype(np.int64) * span + ticks, kind="stable")
+
+
+def equity_curve(merged_df, regime="All"):
+    # cumulative closed_pnl - fee per account in trade-time order; ties keep
+    # file order
+    frame = merged_df
+    if regime != "All":
+        frame = merged_df[(merged_df["sentiment_binary"] == regime).to_numpy()]
+
+    codes, accounts = pd.factorize(frame["account"], sort=True)
+    times = frame["trade_time"].to_numpy()
+    order = _account_time_order(codes, times)
+    codes = codes[order]
+
+    pnl = (frame["closed_pnl"].to_numpy() - frame["fee"].to_numpy())[order]
+    equity = pd.Series(pnl).groupby(codes).cumsum().to_numpy()
+    # every curve starts from a flat account at zero
+    peak = np.maximum(pd.Series(equity).groupby(codes).cummax().to_numpy(), 0.0)
+
+    return pd.DataFrame({
+        "account": accounts.take(codes),
+        "account_code": codes,
+        "trade_time": times[order],
+        "sentiment_binary": frame["sentiment_binary"].to_numpy()[order],
+        "pnl": pnl,
+        "equity": equity,
+        "peak": peak,
+        "drawdown": peak - equity,
+    })
+
+
+def _days(delta):
+    return delta / np.timedelta64(1, "D")
+
+
+def drawdown_summary(curve):
+
+    codes = curve["account_code"].to_numpy()
+    times = curve["trade_time"].to_numpy()
+    equity = curve["equity"].to_numpy()
+    drawdown = curve["drawdown"].to_numpy()
+
+    n_accounts = codes[-1] + 1 if len(codes) else 0
+    first = np.searchsorted(codes, np.arange(n_accounts), side="left")
+    last = np.searchsorted(codes, np.arange(n_accounts), side="right") - 1
+
+    # rows at a new equity high close every drawdown that came before them
+    highs = np.flatnonzero(drawdown == 0)
+
+    trough = pd.Series(drawdown).groupby(codes).idxmax().to_numpy()
+    max_drawdown = drawdown[trough]
+    in_drawdown = max_drawdown > 0
+
+    k = np.searchsorted(highs, trough, side="right")
+    before = highs[np.clip(k - 1, 0, None)] if len(highs) else trough
+    has_peak = (k > 0) & (codes[before] == np.arange(n_accounts))
+    # a drawdown from the opening zero balance peaks at the first trade
+    peak_time = np.where(has_peak, times[before], times[first])
+
+    after = highs[np.clip(k, None, len(highs) - 1)] if len(highs) else trough
+    recovered = (k < len(highs)) & (codes[after] == np.arange(n_accounts))
+    nat = np.datetime64("NaT", "ns")
+    recovery_time = np.where(recovered & in_drawdown, times[after], nat)
+
+    # underwater spells run from an anchor (a new high, or the opening
+    # balance just before the first trade) to the next high, or to the last
+    # trade while still underwater
+    anchor_pos = np.concatenate([highs, first - 0.5])
+    anchor_code = np.concatenate([codes[highs], np.arange(n_accounts)])
+    anchor_time = np.concatenate([times[highs], times[first]])
+    anchor_order = np.argsort(anchor_pos, kind="stable")
+    anchor_pos, anchor_code, anchor_time = (
+        anchor_pos[anchor_order], anchor_code[anchor_order], anchor_time[anchor_order]
+    )
+
+    next_pos = np.append(anchor_pos[1:], np.inf)
+    next_code = np.append(anchor_code[1:], -1)
+    same_account = next_code == anchor_code
+    end_pos = np.where(same_account, next_pos, last[anchor_code] + 1)
+    underwater = end_pos - anchor_pos > 1
+    end_time = np.where(
+        same_account, times[np.clip(next_pos, 0, len(times) - 1).astype(np.int64)], times[last[anchor_code]]
+    )
+    spell_days = np.where(underwater, _days(end_time - anchor_time), 0.0)
+    longest = pd.Series(spell_days).groupby(anchor_code).max().reindex(range(n_accounts), fill_value=0.0)
+
+    trough_time = times[trough]
+    return pd.DataFrame({
+        "account": curve["account"].to_numpy()[first],
+        "trades": last - first + 1,
+        "final_equity": equity[last],
+        "peak_equity": curve["peak"].to_numpy()[last],
+        "max_drawdown": max_drawdown,
+        "peak_time": np.where(in_drawdown, peak_time, nat),
+        "trough_time": np.where(in_drawdown, trough_time, nat),
+        "recovery_time": recovery_time,
+        "drawdown_days": np.where(in_drawdown, _days(trough_time - peak_time), 0.0),
+        "recovery_days": _days(recovery_time - trough_time),
+        "longest_underwater_days": longest.to_numpy(),
+        "current_drawdown": drawdown[last],
+    })
+
+
+def create_drawdowns(merged_df):
+
+    print("\n" + "=" * 80)
+    print("EQUITY CURVES AND DRAWDOWNS")
+    print("=" * 80)
+
+    summaries = []
+    for regime in DRAWDOWN_REGIMES:
+        summary = drawdown_summary(equity_curve(merged_df, regime))
+        summary.insert(1, "regime", regime)
+        summaries.append(summary)
+
+        print(f"\n📉 {regime}: median max drawdown ${summary['max_drawdown'].median():,.2f}, "
+              f"{(summary['current_drawdown'] > 0).mean():.0%} of accounts underwater, "
+              f"median longest underwater spell {summary['longest_underwater_days'].median():.1f} days")
+
+    return pd.concat(summaries, ignore_index=True)
+
+
+def export_drawdowns(drawdowns, output_path=None):
+    drawdowns.to_csv(_output_file(DRAWDOWN_FILE, output_path), index=False)
+    print(f"✅ Saved: {DRAWDOWN_FILE}")
+
+
+#analytics cube
+CUBE_MEASURES = ["pnl_sum", "pnl_sumsq", "n", "size_sum", "fee_sum", "buys", "wins"]
+
+
+def _finalize_rollup(stats):
+
+    n = stats["n"]
+    rollup = pd.DataFrame({
+        "num_trades": n,
+        "total_pnl": stats["pnl_sum"],
+        "avg_pnl": stats["pnl_sum"] / n,
+        "pnl_std": _stats_std(stats),
+        "total_volume": stats["size_sum"],
+        "avg_trade_size": stats["size_sum"] / n,
+        "total_fees": stats["fee_sum"],
+        "buy_ratio": stats["buys"] / n,
+        "win_rate": stats["wins"] / n,
+    })
+    rollup["net_pnl"] = rollup["total_pnl"] - rollup["total_fees"]
+
+    return rollup
+
+
+class AnalyticsCube:
+    # additive trade statistics at CUBE_KEYS grain, with each account's segment
+    # labels carried along as extra dimensions; any coarser slice is a
+    # groupby-sum over these cells, finalised like the daily metrics
+
+    def __init__(self, base):
+        self.base = base
+        self._rollups = {}
+
+    @classmethod
+    def from_partials(cls, stats, trader_profile=None, account_lookup=None):
+        base = stats.reset_index()
+        if account_lookup is not None:
+            base["account"] = pd.Categorical.from_codes(base["account"], categories=account_lookup)
+        for column in ["account", "coin", "sentiment_binary"]:
+            base[column] = base[column].astype("category")
+
+        dimensions = list(CUBE_KEYS)
+        if trader_profile is not None:
+            segments = trader_profile.set_index("account")
+            for column in SEGMENT_COLUMNS:
+                base[column] = base["account"].map(segments[column]).astype("category")
+            dimensions += SEGMENT_COLUMNS
+
+        return cls(base[dimensions + CUBE_MEASURES])
+
+    @classmethod
+    def read(cls, output_path=None, fmt=None):
+        base = read_table(CUBE_FILE, output_path, fmt=fmt).drop(columns="month", errors="ignore")
+        base["trade_date"] = pd.to_datetime(base["trade_date"])
+        dimensions = [column for column in base.columns if column not in CUBE_MEASURES]
+        base = base.astype({column: "category" for column in dimensions if column != "trade_date"})
+        return cls(base[dimensions + CUBE_MEASURES])
+
+    @property
+    def dimensions(self):
+        return [column for column in self.base.columns if column not in CUBE_MEASURES]
+
+    def _mask(self, where):
+        mask = np.ones(len(self.base), dtype=bool)
+        for column, value in where.items():
+            values = self.base[column]
+            if isinstance(value, slice):
+                # inclusive bounds, e.g. {"trade_date": slice("2024-01-01", "2024-03-31")}
+                if value.start is not None:
+                    mask &= (values >= value.start).to_numpy()
+                if value.stop is not None:
+                    mask &= (values <= value.stop).to_numpy()
+            elif isinstance(value, (list, tuple, set)):
+                mask &= values.isin(list(value)).to_numpy()
+            else:
+                mask &= (values == value).to_numpy()
+        return mask
+
+    def rollup(self, by=(), where=None):
+        by = [by] if isinstance(by, str) else list(by)
+        where = where or {}
+        unknown = (set(by) | set(where)) - set(self.dimensions)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {sorted(unknown)} (choose from {self.dimensions})")
+
+        # rollups are memoized, so the precomputed ones and repeated queries
+        # never touch the cells again
+        key = (tuple(by), repr(sorted(where.items(), key=lambda item: item[0])))
+        if key not in self._rollups:
+            cells = self.base[self._mask(where)] if where else self.base
+            # an empty `by` is the grand total, a single group
+            keys = by or np.zeros(len(cells), dtype=np.int8)
+            stats = cells.groupby(keys, observed=True)[CUBE_MEASURES].sum()
+            self._rollups[key] = _finalize_rollup(stats).reset_index(drop=not by)
+        return self._rollups[key].copy()
+
+
+def create_cube(stats, trader_profile=None, account_lookup=None):
 
-SENTIMENT_FILE = "fear_greed_index.csv"
-TRADER_FILE = "historical_data.csv"
+    print("\n" + "=" * 80)
+    print("ANALYTICS CUBE")
+    print("=" * 80)
 
-#Visualization
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+    cube = AnalyticsCube.from_partials(stats, trader_profile, account_lookup)
+    for by in CUBE_ROLLUPS:
+        cube.rollup(by)
 
-#loading and cleaning
-def load_and_clean_data():
+    print(f"✅ Cube: {len(cube.base):,} cells ({_memory_mb(cube.base):.1f} MB), "
+          f"{cube.base['n'].sum():,} trades")
+    print(f"   Dimensions: {', '.join(cube.dimensions)}")
+    return cube
 
-    print("=" * 80)
-    print("LOADING AND CLEANING DATA")
-    print("=" * 80)
 
-    sentiment_df = pd.read_csv(DATA_PATH + SENTIMENT_FILE)
+def export_cube(cube, output_path=None, fmt=None):
 
-    sentiment_df["date"] = pd.to_datetime(sentiment_df["date"]).dt.normalize()
-    sentiment_df = sentiment_df.dropna(subset=["classification"])
-    sentiment_df["classification"] = (
-        sentiment_df["classification"].str.strip().str.title()
-    )
+    saved = write_table(cube.base, CUBE_FILE, output_path, fmt, EXPORT_PARTITIONS)
+    print(f"✅ Saved: {saved}")
 
-    def map_sentiment(row):
-        if "Fear" in row["classification"]:
-            return "Fear"
-        elif "Greed" in row["classification"]:
-            return "Greed"
-        else:
-            if row["value"] < 45:
-                return "Fear"
-            elif row["value"] > 55:
-                return "Greed"
-            else:
-                return "Neutral"
+    by_coin = cube.rollup(["coin", "sentiment_binary"])
+    by_coin.to_csv(_output_file(CUBE_SUMMARY_FILE, output_path), index=False)
+    print(f"✅ Saved: {CUBE_SUMMARY_FILE}")
 
-    sentiment_df["sentiment_binary"] = sentiment_df.apply(map_sentiment, axis=1)
+    top_coins = cube.rollup("coin").nlargest(10, "total_volume")["coin"]
+    table = by_coin[by_coin["coin"].isin(top_coins)].pivot(
+        index="coin", columns="sentiment_binary", values=["net_pnl", "win_rate"]
+    ).reindex(top_coins)
+    print("\n💰 Top coins by volume: net PnL and win rate by sentiment")
+    print(table.round(2).to_string())
 
-    print("✅ Sentiment data loaded:", sentiment_df.shape)
-    print("   Date range:", sentiment_df["date"].min(), "→", sentiment_df["date"].max())
-    print("   Sentiment distribution:")
-    print(sentiment_df["sentiment_binary"].value_counts())
 
-    trader_df = pd.read_csv(DATA_PATH + TRADER_FILE)
+#intraday
+INTRADAY_KEYS = DAILY_KEYS + ["bucket_start"]
 
-    # normalize column names
-    trader_df.columns = (
-        trader_df.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(" ", "_")
-    )
 
-    if "timestamp_ist" not in trader_df.columns:
-        raise ValueError("timestamp_ist column missing in trader data")
+def _with_buckets(merged_df, width):
+    width = pd.Timedelta(width)
+    if width < pd.Timedelta("1min") or pd.Timedelta("1D") % width or width % pd.Timedelta("1min"):
+        raise ValueError(f"Intraday bucket width must be whole minutes dividing a day, got {width}")
+    return merged_df.assign(bucket_start=merged_df["trade_time"].dt.floor(width))
 
-    trader_df["trade_time"] = pd.to_datetime(
-        trader_df["timestamp_ist"],
-        format="%d-%m-%Y %H:%M",
-        errors="coerce"
-    )
 
-    trader_df["trade_date"] = trader_df["trade_time"].dt.normalize()
+def create_intraday_metrics(merged_df, bucket):
+
+    print("\n" + "=" * 80)
+    print("CREATING DAILY + INTRADAY METRICS")
+    print("=" * 80)
 
-    trader_df["closed_pnl"] = pd.to_numeric(
-        trader_df.get("closed_pnl", 0), errors="coerce"
-    ).fillna(0)
+    # one groupby at bucket grain; the daily metrics are sums of its rows,
+    # and those daily sums are returned as well
+    bucket_stats = _partial_stats(_with_buckets(merged_df, bucket), INTRADAY_KEYS)
+    daily_stats = bucket_stats.groupby(level=DAILY_KEYS, observed=True).sum()
+    daily_metrics = _finalize_daily(daily_stats)
 
-    trader_df["size_usd"] = pd.to_numeric(
-        trader_df.get("size_usd", 0), errors="coerce"
-    ).fillna(0)
+    print("✅ Daily metrics created:", daily_metrics.shape)
+    print(f"✅ Intraday buckets ({bucket}): {len(bucket_stats):,} account-buckets")
+    return daily_metrics, bucket_stats, daily_stats
 
-    trader_df["fee"] = pd.to_numeric(
-        trader_df.get("fee", 0), errors="coerce"
-    ).fillna(0)
 
-    print("✅ Trader data loaded:", trader_df.shape)
-    print("   Date range:", trader_df["trade_date"].min(), "→", trader_df["trade_date"].max())
-    print("   Unique traders:", trader_df["account"].nunique())
-    print("   Unique coins:", trader_df["coin"].nunique())
+def summarize_intraday(bucket_stats):
 
-    # ---------- Merge ----------
-    merged_df = trader_df.merge(
-        sentiment_df[["date", "sentiment_binary"]],
-        left_on="trade_date",
-        right_on="date",
-        how="inner"
-    )
+    per_bucket = _finalize_rollup(bucket_stats).reset_index()
 
-    merged_df = merged_df[
-        merged_df["sentiment_binary"].isin(["Fear", "Greed"])
-    ]
+    # bucket starts are trade-local (IST) times, so time_of_day lines up across days
+    stats = bucket_stats.reset_index()
+    minutes = (stats["bucket_start"] - stats["trade_date"]) // pd.Timedelta("1min")
+    codes, uniques = pd.factorize(minutes, sort=True)
+    stats["time_of_day"] = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in uniques])[codes]
+    grouped = stats.groupby(["time_of_day", "sentiment_binary"], observed=True)
 
-    print("✅ Merged dataset:", merged_df.shape)
-    print("   Final sentiment distribution:")
-    print(merged_df["sentiment_binary"].value_counts())
+    profile = _finalize_rollup(grouped[CUBE_MEASURES].sum())
+    profile["active_accounts"] = grouped["account"].nunique()
+    profile["account_buckets"] = grouped.size()
+    profile["trades_per_account_bucket"] = profile["num_trades"] / profile["account_buckets"]
 
-    if merged_df.empty:
-        raise ValueError("Merged dataframe is EMPTY. Date mismatch issue.")
+    return per_bucket, profile.reset_index()
 
-    return merged_df, sentiment_df
 
-#METRICS
-def create_daily_metrics(merged_df):
+def export_intraday(per_bucket, profile, output_path=None, fmt=None):
 
     print("\n" + "=" * 80)
-    print("CREATING DAILY METRICS")
+    print("INTRADAY METRICS")
     print("=" * 80)
 
-    grouped = merged_df.groupby(
-        ["account", "trade_date", "sentiment_binary"]
-    )
+    for sentiment, frame in profile.groupby("sentiment_binary", observed=True):
+        busiest = frame.loc[frame["num_trades"].idxmax()]
+        best = frame.loc[frame["win_rate"].idxmax()]
+        print(f"   {sentiment}: busiest bucket {busiest['time_of_day']} "
+              f"({busiest['trades_per_account_bucket']:.1f} trades/account), "
+              f"best win rate {best['time_of_day']} ({best['win_rate']:.2%})")
 
-    daily_metrics = grouped.agg({
-        "closed_pnl": ["sum", "mean", "std", "count"],
-        "size_usd": ["sum", "mean"],
-        "fee": "sum"
-    }).reset_index()
+    saved = write_table(per_bucket, INTRADAY_FILE, output_path, fmt, EXPORT_PARTITIONS)
+    print(f"✅ Saved: {saved}")
+    profile.to_csv(_output_file(INTRADAY_PROFILE_FILE, output_path), index=False)
+    print(f"✅ Saved: {INTRADAY_PROFILE_FILE}")
 
-    daily_metrics.columns = [
-        "account",
-        "trade_date",
-        "sentiment_binary",
-        "daily_pnl",
-        "avg_pnl_per_trade",
-        "pnl_volatility",
-        "num_trades",
-        "total_volume",
-        "avg_trade_size",
-        "total_fees"
-    ]
 
-    #buy ratio
-    buy_ratio = (
-        merged_df
-        .groupby(["account", "trade_date"])["side"]
-        .apply(lambda x: (x == "BUY").mean())
-        .reset_index(name="buy_ratio")
-    )
+#memoized intermediates
+SEGMENT_COLUMNS = ["volume_segment", "frequency_segment", "performance_segment"]
 
-    #Win rate
-    win_rate = (
-        merged_df
-        .groupby(["account", "trade_date"])["closed_pnl"]
-        .apply(lambda x: (x > 0).mean())
-        .reset_index(name="win_rate")
-    )
 
-    daily_metrics = daily_metrics.merge(
-        buy_ratio, on=["account", "trade_date"], how="left"
+def _with_segments(daily_metrics, trader_profile):
+    return daily_metrics.merge(
+        trader_profile[["account"] + SEGMENT_COLUMNS],
+        on="account",
+        how="left"
     )
 
-    daily_metrics = daily_metrics.merge(
-        win_rate, on=["account", "trade_date"], how="left"
-    )
 
-    daily_metrics["pnl_volatility"] = daily_metrics["pnl_volatility"].fillna(0)
-    daily_metrics["net_pnl"] = (
-        daily_metrics["daily_pnl"] - daily_metrics["total_fees"]
-    )
+class DerivedFrames:
+    # frames several stages derive from the same daily metrics / profiles,
+    # built on first use and shared for the rest of the run
 
-    print("✅ Daily metrics created:", daily_metrics.shape)
+    def __init__(self, daily_metrics, trader_profile=None):
+        self.daily_metrics = daily_metrics
+        self.trader_profile = trader_profile
 
-    return daily_metrics
+    @cached_property
+    def daily_with_segments(self):
+        return _with_segments(self.daily_metrics, self.trader_profile)
 
-#trader segmentaion
-def create_trader_segments(merged_df):
-    
-    print("\n" + "=" * 80)
-    print("CREATING TRADER SEGMENTS")
-    print("=" * 80)
-    
-    #overall trader profiles
-    trader_profile = merged_df.groupby("account").agg({
-        "closed_pnl": ["sum", "mean", "std"],
-        "size_usd": "mean",
-        "fee": "sum",
-        "trade_date": "count"
-    }).reset_index()
-    
-    trader_profile.columns = [
-        "account", "total_pnl", "avg_pnl", "pnl_std",
-        "avg_size", "total_fees", "total_trades"
+    @cached_property
+    def partitions(self):
+        return {
+            str(sentiment): frame
+            for sentiment, frame in self.daily_metrics.groupby("sentiment_binary", observed=True)
+        }
+
+    def sentiment(self, label):
+        return self.partitions.get(label, self.daily_metrics.iloc[:0])
+
+    @cached_property
+    def report_summary(self):
+        return ReportSummary(build_report_summary(self.daily_with_segments))
+
+
+def _input_fingerprint(data_path=None):
+    # size + mtime of the raw inputs, the same fast check the ingest cache uses
+    fingerprint = {}
+    for name in (TRADER_FILE, SENTIMENT_FILE):
+        stat = os.stat(_data_file(name, data_path))
+        fingerprint[name] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+class StageCache:
+
+    def __init__(self, directory, max_mb=None):
+        self.directory = Path(directory)
+        self.max_bytes = (STAGE_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 ** 2
+
+    @staticmethod
+    def key(*parts):
+        payload = json.dumps(parts, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def get(self, key):
+        path = self.directory / f"{key}.pkl"
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except Exception:
+            path.unlink(missing_ok=True)
+            return None
+        # mtime doubles as the last-used time for eviction
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f"{key}.pkl.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.directory / f"{key}.pkl")
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (entry.stat().st_mtime_ns, entry.stat().st_size, entry)
+            for entry in self.directory.glob("*.pkl")
+        )
+        total = sum(size for _, size, _ in entries)
+        # least recently used first; the newest entry is always kept
+        for _, size, entry in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+
+#visual
+SENTIMENT_COLORS = ["#FF6B6B", "#4ECDC4"]
+
+
+def _plotting():
+    # the plotting stack is only imported by the stages that draw
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if not getattr(_plotting, "styled", False):
+        #Visualization
+        plt.style.use('seaborn-v0_8-darkgrid')
+        sns.set_palette("husl")
+        _plotting.styled = True
+
+    return plt
+
+
+def _sentiment_values(daily_metrics, column):
+    return [
+        daily_metrics.loc[daily_metrics["sentiment_binary"] == sentiment, column].to_numpy()
+        for sentiment in ["Fear", "Greed"]
     ]
-    
-    #calculate win rate per trader
-    trader_win_rate = (
-        merged_df
-        .groupby("account")["closed_pnl"]
-        .apply(lambda x: (x > 0).mean())
-        .reset_index(name="overall_win_rate")
-    )
-    
-    trader_profile = trader_profile.merge(trader_win_rate, on="account")
-    trader_profile["net_profit"] = trader_profile["total_pnl"] - trader_profile["total_fees"]
-    
-    volume_threshold = trader_profile["avg_size"].median()
-    trader_profile["volume_segment"] = trader_profile["avg_size"].apply(
-        lambda x: "High Volume" if x >= volume_threshold else "Low Volume"
-    )
 
-    freq_threshold = trader_profile["total_trades"].quantile(0.75)
-    trader_profile["frequency_segment"] = trader_profile["total_trades"].apply(
-        lambda x: "Frequent" if x >= freq_threshold else "Infrequent"
-    )
-    
-    trader_profile["performance_segment"] = trader_profile.apply(
-        lambda row: "Consistent Winner" if (row["net_profit"] > 0 and row["overall_win_rate"] > 0.5)
-        else "Inconsistent", axis=1
+
+def _box_stats(daily_metrics, column):
+    from matplotlib import cbook
+    return cbook.boxplot_stats(
+        _sentiment_values(daily_metrics, column), labels=["Fear", "Greed"]
     )
-    
-    print(f"✅ Trader segments created")
-    print(f"\n1️. Volume Segments (threshold: ${volume_threshold:.2f}):")
-    print(trader_profile["volume_segment"].value_counts())
-    print(f"\n2️. Frequency Segments (threshold: {freq_threshold:.0f} trades):")
-    print(trader_profile["frequency_segment"].value_counts())
-    print(f"\n3️. Performance Segments:")
-    print(trader_profile["performance_segment"].value_counts())
-    
-    return trader_profile
 
 
-#visual
-def visualize_performance_comparison(daily_metrics):
-    
-    print("\n" + "=" * 80)
-    print("GENERATING PERFORMANCE VISUALIZATIONS")
-    print("=" * 80)
-    
+def _sentiment_means(daily_metrics, column):
+    means = daily_metrics.groupby("sentiment_binary", observed=True)[column].mean()
+    return list(means.index.astype(str)), means.to_numpy()
+
+
+def summarize_performance(daily_metrics):
+
+    histograms = {}
+    for sentiment, data in zip(["Fear", "Greed"], _sentiment_values(daily_metrics, "daily_pnl")):
+        # Filter outliers
+        q1, q99 = np.quantile(data, [0.01, 0.99]) if len(data) else (0, 0)
+        data_filtered = data[(data >= q1) & (data <= q99)]
+        histograms[sentiment] = np.histogram(data_filtered, bins=50) if len(data_filtered) else None
+
+    return {
+        "histograms": histograms,
+        "win_rate_box": _box_stats(daily_metrics, "win_rate"),
+        "avg_pnl": _sentiment_means(daily_metrics, "avg_pnl_per_trade"),
+        "volatility": _sentiment_means(daily_metrics, "pnl_volatility"),
+    }
+
+
+def summarize_behavior(daily_metrics):
+    return {
+        "trades_box": _box_stats(daily_metrics, "num_trades"),
+        "size_box": _box_stats(daily_metrics, "avg_trade_size"),
+        "buy_ratio": _sentiment_means(daily_metrics, "buy_ratio"),
+        "volume": _sentiment_means(daily_metrics, "total_volume"),
+    }
+
+
+def summarize_segments(daily_metrics, trader_profile, derived=None):
+
+    #merge segments 
+    derived = derived or DerivedFrames(daily_metrics, trader_profile)
+    daily_with_segments = derived.daily_with_segments
+
+    return {
+        segment: daily_with_segments.groupby(
+            [segment, "sentiment_binary"], observed=True
+        )["daily_pnl"].mean().unstack()
+        for segment in SEGMENT_COLUMNS
+    }
+
+
+def render_performance(summary, path):
+
+    plt = _plotting()
+
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
     
     #daily PnL
     ax1 = axes[0, 0]
-    for sentiment in ["Fear", "Greed"]:
-        data = daily_metrics[daily_metrics["sentiment_binary"] == sentiment]["daily_pnl"]
-        # Filter outliers
-        q1, q99 = data.quantile([0.01, 0.99])
-        data_filtered = data[(data >= q1) & (data <= q99)]
-        ax1.hist(data_filtered, bins=50, alpha=0.6, label=sentiment, edgecolor="black")
+    for sentiment, histogram in summary["histograms"].items():
+        if histogram is None:
+            continue
+        counts, edges = histogram
+        ax1.hist(edges[:-1], bins=edges, weights=counts, alpha=0.6, label=sentiment, edgecolor="black")
     ax1.set_xlabel("Daily PnL ($)", fontsize=12)
     ax1.set_ylabel("Frequency", fontsize=12)
     ax1.set_title("Daily PnL Distribution: Fear vs Greed", fontsize=14, fontweight="bold")
@@ -259,18 +2182,15 @@ def visualize_performance_comparison(daily_metrics):
     
     # Win Rate Comparison
     ax2 = axes[0, 1]
-    fear_wr = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["win_rate"].values
-    greed_wr = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["win_rate"].values
-    ax2.boxplot([fear_wr, greed_wr], labels=["Fear", "Greed"])
+    ax2.bxp(summary["win_rate_box"])
     ax2.set_ylabel("Win Rate", fontsize=12)
     ax2.set_title("Win Rate Distribution: Fear vs Greed", fontsize=14, fontweight="bold")
     ax2.grid(True, alpha=0.3, axis="y")
     
     #average PnL per Trade
     ax3 = axes[1, 0]
-    avg_pnl = daily_metrics.groupby("sentiment_binary")["avg_pnl_per_trade"].mean()
-    colors = ["#FF6B6B", "#4ECDC4"]
-    bars = ax3.bar(avg_pnl.index, avg_pnl.values, color=colors, edgecolor="black")
+    labels, values = summary["avg_pnl"]
+    bars = ax3.bar(labels, values, color=SENTIMENT_COLORS, edgecolor="black")
     ax3.set_ylabel("Average PnL per Trade ($)", fontsize=12)
     ax3.set_title("Average PnL per Trade: Fear vs Greed", fontsize=14, fontweight="bold")
     ax3.axhline(0, color="red", linestyle="--", alpha=0.5)
@@ -282,8 +2202,8 @@ def visualize_performance_comparison(daily_metrics):
     
     #Volatility
     ax4 = axes[1, 1]
-    volatility = daily_metrics.groupby("sentiment_binary")["pnl_volatility"].mean()
-    bars = ax4.bar(volatility.index, volatility.values, color=colors, edgecolor="black")
+    labels, values = summary["volatility"]
+    bars = ax4.bar(labels, values, color=SENTIMENT_COLORS, edgecolor="black")
     ax4.set_ylabel("Average PnL Volatility ($)", fontsize=12)
     ax4.set_title("PnL Volatility: Fear vs Greed", fontsize=14, fontweight="bold")
     ax4.grid(True, alpha=0.3, axis="y")
@@ -293,39 +2213,34 @@ def visualize_performance_comparison(daily_metrics):
                  f"${height:.2f}", ha="center", va="bottom")
     
     plt.tight_layout()
-    plt.savefig(OUTPUT_PATH + "performance_fear_vs_greed.png", dpi=300, bbox_inches="tight")
-    print("✅ Saved: performance_fear_vs_greed.png")
+    plt.savefig(path, dpi=300, bbox_inches="tight")
     plt.close()
 
 
-def visualize_behavior_comparison(daily_metrics):
-    
-    print("Generating behavioral visualizations...")
+def render_behavior(summary, path):
+
+    plt = _plotting()
     
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
     
     #trade Frequency
     ax1 = axes[0, 0]
-    fear_trades = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["num_trades"].values
-    greed_trades = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["num_trades"].values
-    ax1.boxplot([fear_trades, greed_trades], labels=["Fear", "Greed"])
+    ax1.bxp(summary["trades_box"])
     ax1.set_ylabel("Number of Trades per Day", fontsize=12)
     ax1.set_title("Trading Frequency: Fear vs Greed", fontsize=14, fontweight="bold")
     ax1.grid(True, alpha=0.3, axis="y")
     
     #Trade Size
     ax2 = axes[0, 1]
-    fear_size = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["avg_trade_size"].values
-    greed_size = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["avg_trade_size"].values
-    ax2.boxplot([fear_size, greed_size], labels=["Fear", "Greed"])
+    ax2.bxp(summary["size_box"])
     ax2.set_ylabel("Average Trade Size ($)", fontsize=12)
     ax2.set_title("Position Sizing: Fear vs Greed", fontsize=14, fontweight="bold")
     ax2.grid(True, alpha=0.3, axis="y")
     
     #buy/sell Ratio
     ax3 = axes[1, 0]
-    buy_ratio = daily_metrics.groupby("sentiment_binary")["buy_ratio"].mean()
-    bars = ax3.bar(buy_ratio.index, buy_ratio.values, color=["#FF6B6B", "#4ECDC4"], edgecolor="black")
+    labels, values = summary["buy_ratio"]
+    bars = ax3.bar(labels, values, color=SENTIMENT_COLORS, edgecolor="black")
     ax3.set_ylabel("BUY Position Ratio", fontsize=12)
     ax3.set_title("Long vs Short Bias: Fear vs Greed", fontsize=14, fontweight="bold")
     ax3.axhline(0.5, color="black", linestyle="--", alpha=0.5, label="Neutral (50%)")
@@ -339,8 +2254,8 @@ def visualize_behavior_comparison(daily_metrics):
     
     #Volume
     ax4 = axes[1, 1]
-    volume = daily_metrics.groupby("sentiment_binary")["total_volume"].mean()
-    bars = ax4.bar(volume.index, volume.values, color=["#FF6B6B", "#4ECDC4"], edgecolor="black")
+    labels, values = summary["volume"]
+    bars = ax4.bar(labels, values, color=SENTIMENT_COLORS, edgecolor="black")
     ax4.set_ylabel("Average Total Volume ($)", fontsize=12)
     ax4.set_title("Trading Volume: Fear vs Greed", fontsize=14, fontweight="bold")
     ax4.grid(True, alpha=0.3, axis="y")
@@ -350,77 +2265,305 @@ def visualize_behavior_comparison(daily_metrics):
                  f"${height:,.0f}", ha="center", va="bottom", fontsize=10)
     
     plt.tight_layout()
-    plt.savefig(OUTPUT_PATH + "behavior_fear_vs_greed.png", dpi=300, bbox_inches="tight")
-    print("✅ Saved: behavior_fear_vs_greed.png")
+    plt.savefig(path, dpi=300, bbox_inches="tight")
     plt.close()
 
 
-def visualize_segment_analysis(daily_metrics, trader_profile):
-    
-    print("Generating segment analysis visualizations...")
-    
-    #merge segments 
-    daily_with_segments = daily_metrics.merge(
-        trader_profile[["account", "volume_segment", "frequency_segment", "performance_segment"]],
-        on="account",
-        how="left"
-    )
-    
+def render_segments(summary, path):
+
+    plt = _plotting()
+
     fig, axes = plt.subplots(1, 3, figsize=(20, 6))
-    
-    #Volume 
-    ax1 = axes[0]
-    volume_pivot = daily_with_segments.groupby(["volume_segment", "sentiment_binary"])["daily_pnl"].mean().unstack()
-    volume_pivot.plot(kind="bar", ax=ax1, color=["#FF6B6B", "#4ECDC4"], edgecolor="black", width=0.7)
-    ax1.set_xlabel("Volume Segment", fontsize=12)
-    ax1.set_ylabel("Average Daily PnL ($)", fontsize=12)
-    ax1.set_title("Performance by Volume: Fear vs Greed", fontsize=14, fontweight="bold")
-    ax1.legend(title="Sentiment")
-    ax1.axhline(0, color="red", linestyle="--", alpha=0.5)
-    ax1.grid(True, alpha=0.3, axis="y")
-    ax1.tick_params(axis="x", rotation=0)
-    
-    #Frequency
-    ax2 = axes[1]
-    freq_pivot = daily_with_segments.groupby(["frequency_segment", "sentiment_binary"])["daily_pnl"].mean().unstack()
-    freq_pivot.plot(kind="bar", ax=ax2, color=["#FF6B6B", "#4ECDC4"], edgecolor="black", width=0.7)
-    ax2.set_xlabel("Frequency Segment", fontsize=12)
-    ax2.set_ylabel("Average Daily PnL ($)", fontsize=12)
-    ax2.set_title("Performance by Frequency: Fear vs Greed", fontsize=14, fontweight="bold")
-    ax2.legend(title="Sentiment")
-    ax2.axhline(0, color="red", linestyle="--", alpha=0.5)
-    ax2.grid(True, alpha=0.3, axis="y")
-    ax2.tick_params(axis="x", rotation=0)
-    
-    #Performance 
-    ax3 = axes[2]
-    perf_pivot = daily_with_segments.groupby(["performance_segment", "sentiment_binary"])["daily_pnl"].mean().unstack()
-    perf_pivot.plot(kind="bar", ax=ax3, color=["#FF6B6B", "#4ECDC4"], edgecolor="black", width=0.7)
-    ax3.set_xlabel("Performance Segment", fontsize=12)
-    ax3.set_ylabel("Average Daily PnL ($)", fontsize=12)
-    ax3.set_title("Performance by Trader Type: Fear vs Greed", fontsize=14, fontweight="bold")
-    ax3.legend(title="Sentiment")
-    ax3.axhline(0, color="red", linestyle="--", alpha=0.5)
-    ax3.grid(True, alpha=0.3, axis="y")
-    ax3.tick_params(axis="x", rotation=0)
+
+    panels = [
+        ("volume_segment", "Volume Segment", "Performance by Volume: Fear vs Greed"),
+        ("frequency_segment", "Frequency Segment", "Performance by Frequency: Fear vs Greed"),
+        ("performance_segment", "Performance Segment", "Performance by Trader Type: Fear vs Greed"),
+    ]
+
+    for ax, (segment, xlabel, title) in zip(axes, panels):
+        summary[segment].plot(kind="bar", ax=ax, color=SENTIMENT_COLORS, edgecolor="black", width=0.7)
+        ax.set_xlabel(xlabel, fontsize=12)
+        ax.set_ylabel("Average Daily PnL ($)", fontsize=12)
+        ax.set_title(title, fontsize=14, fontweight="bold")
+        ax.legend(title="Sentiment")
+        ax.axhline(0, color="red", linestyle="--", alpha=0.5)
+        ax.grid(True, alpha=0.3, axis="y")
+        ax.tick_params(axis="x", rotation=0)
     
     plt.tight_layout()
-    plt.savefig(OUTPUT_PATH + "segment_analysis.png", dpi=300, bbox_inches="tight")
-    print("✅ Saved: segment_analysis.png")
+    plt.savefig(path, dpi=300, bbox_inches="tight")
     plt.close()
 
 
+FIGURES = {
+    "performance_fear_vs_greed.png": render_performance,
+    "behavior_fear_vs_greed.png": render_behavior,
+    "segment_analysis.png": render_segments,
+}
+
+
+def _render_figure(job):
+    filename, summary, path = job
+    FIGURES[filename](summary, path)
+    return filename
+
+
+def _canonical(value):
+    # pickle bytes depend on object sharing (a frame read back from the stage
+    # cache pickles differently from a freshly built one), so hash a plain form
+    if isinstance(value, pd.DataFrame):
+        return {
+            "index": _canonical(value.index.to_numpy()),
+            "columns": _canonical(value.columns.to_numpy()),
+            "values": _canonical(value.to_numpy()),
+        }
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return [_canonical(item) for item in value.tolist()]
+        return [value.dtype.str, value.shape, value.tobytes().hex()]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, np.generic):
+        return repr(value.item())
+    return repr(value)
+
+
+def _summary_hash(summary):
+    payload = json.dumps([FIGURE_VERSION, _canonical(summary)], sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def render_figures(daily_metrics, trader_profile, workers=None, output_path=None, derived=None):
+
+    print("\n" + "=" * 80)
+    print("GENERATING VISUALIZATIONS")
+    print("=" * 80)
+
+    # the small per-figure tables are built once, up front
+    summaries = {
+        "performance_fear_vs_greed.png": summarize_performance(daily_metrics),
+        "behavior_fear_vs_greed.png": summarize_behavior(daily_metrics),
+        "segment_analysis.png": summarize_segments(daily_metrics, trader_profile, derived),
+    }
+
+    cache_path = _output_file(FIGURE_CACHE_FILE, output_path)
+    cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+
+    jobs = []
+    hashes = {}
+    for filename, summary in summaries.items():
+        hashes[filename] = _summary_hash(summary)
+        path = _output_file(filename, output_path)
+        if cache.get(filename) == hashes[filename] and path.exists():
+            print(f"⏭️  Unchanged: {filename}")
+            continue
+        jobs.append((filename, summary, path))
+
+    workers = min(workers or FIGURE_WORKERS or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(_render_figure, jobs))
+    else:
+        done = [_render_figure(job) for job in jobs]
+
+    for filename in done:
+        cache[filename] = hashes[filename]
+        print(f"✅ Saved: {filename}")
+
+    cache_path.write_text(json.dumps(cache, indent=2))
+
+
+def visualize_performance_comparison(daily_metrics, output_path=None):
+    render_performance(summarize_performance(daily_metrics),
+                       _output_file("performance_fear_vs_greed.png", output_path))
+    print("✅ Saved: performance_fear_vs_greed.png")
+
+
+def visualize_behavior_comparison(daily_metrics, output_path=None):
+    render_behavior(summarize_behavior(daily_metrics),
+                    _output_file("behavior_fear_vs_greed.png", output_path))
+    print("✅ Saved: behavior_fear_vs_greed.png")
+
+
+def visualize_segment_analysis(daily_metrics, trader_profile, output_path=None):
+    render_segments(summarize_segments(daily_metrics, trader_profile),
+                    _output_file("segment_analysis.png", output_path))
+    print("✅ Saved: segment_analysis.png")
+
+
 #STATISTICS
-def statistical_analysis(daily_metrics):
+#batched statistics
+def _tie_ranks(values):
+    # average ranks of every column from one sort; NaNs sort last and never tie
+    n = len(values)
+    order = np.argsort(values, axis=0, kind="stable")
+    ordered = np.take_along_axis(values, order, axis=0)
+
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[:-1] = starts[1:]
+
+    positions = np.arange(n)[:, None]
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=0)
+    last = np.minimum.accumulate(np.where(ends, positions, n - 1)[::-1], axis=0)[::-1]
+
+    sizes = last - first + 1
+    tie_term = np.where(starts & ~np.isnan(ordered), sizes ** 3 - sizes, 0).sum(axis=0)
+
+    ranks = np.empty(ordered.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=0)
+    return ranks, tie_term
+
+
+def rank_tests(values, in_x):
+    # two-sided Mann-Whitney U for every column at once (normal approximation
+    # with tie and continuity correction, as scipy's asymptotic method)
+    from scipy.special import ndtr
+
+    valid = ~np.isnan(values)
+    ranks, tie_term = _tie_ranks(values)
+
+    x_mask = valid & in_x[:, None]
+    n1 = x_mask.sum(axis=0)
+    n2 = (valid & ~in_x[:, None]).sum(axis=0)
+    n = n1 + n2
+
+    u1 = np.where(x_mask, ranks, 0).sum(axis=0) - n1 * (n1 + 1) / 2
+    u = np.maximum(u1, n1 * n2 - u1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return u1, np.clip(2 * ndtr(-z), 0, 1)
+
+
+def _resample_job(job):
+    kind, seed, size, values, in_x = job
+    rng = np.random.default_rng(seed)
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    weight = valid.astype("float64")
+
+    if kind == "bootstrap":
+        def means(rows):
+            # one (size x rows) index matrix, folded into per-resample counts
+            idx = rng.integers(0, len(rows), size=(size, len(rows)))
+            flat = (np.arange(size)[:, None] * len(rows) + idx).ravel()
+            counts = np.bincount(flat, minlength=size * len(rows)).reshape(size, len(rows))
+            counts = counts.astype("float64")
+            return (counts @ filled[rows]) / (counts @ weight[rows])
+
+        return means(np.flatnonzero(~in_x)) - means(np.flatnonzero(in_x))
+
+    # permutation: every row of the label matrix is one shuffle of the groups
+    labels = rng.permuted(np.tile(in_x, (size, 1)), axis=1).astype("float64")
+    x_sum, x_count = labels @ filled, labels @ weight
+    return (filled.sum(axis=0) - x_sum) / (weight.sum(axis=0) - x_count) - x_sum / x_count
+
+
+def resample_differences(values, in_x, kind, n_resamples, seed, workers=None):
+    # chunked so each index matrix stays under STATS_BATCH elements; chunk
+    # seeds are spawned up front, so results do not depend on the worker count
+    chunk = max(1, STATS_BATCH // max(len(values), 1))
+    sizes = [min(chunk, n_resamples - start) for start in range(0, n_resamples, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(kind, chunk_seed, size, values, in_x) for chunk_seed, size in zip(seeds, sizes)]
+
+    workers = min(workers or 1, len(jobs))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return np.vstack(list(pool.map(_resample_job, jobs)))
+        return np.vstack([_resample_job(job) for job in jobs])
+
+
+def compare_groups(values, in_x, n_resamples=None, seed=None, workers=None, confidence=None):
+
+    n_resamples = STATS_RESAMPLES if n_resamples is None else n_resamples
+    seed = STATS_SEED if seed is None else seed
+    confidence = STATS_CONFIDENCE if confidence is None else confidence
+
+    with np.errstate(invalid="ignore"):
+        fear_mean = np.nanmean(np.where(in_x[:, None], values, np.nan), axis=0)
+        greed_mean = np.nanmean(np.where(in_x[:, None], np.nan, values), axis=0)
+    diff = greed_mean - fear_mean
+    u_statistic, p_rank = rank_tests(values, in_x)
+
+    result = {
+        "n_fear": (in_x[:, None] & ~np.isnan(values)).sum(axis=0),
+        "n_greed": (~in_x[:, None] & ~np.isnan(values)).sum(axis=0),
+        "fear_mean": fear_mean,
+        "greed_mean": greed_mean,
+        "mean_diff": diff,
+        "ci_low": np.full(len(diff), np.nan),
+        "ci_high": np.full(len(diff), np.nan),
+        "u_statistic": u_statistic,
+        "p_mannwhitney": p_rank,
+        "p_permutation": np.full(len(diff), np.nan),
+    }
+    if n_resamples and in_x.any() and not in_x.all():
+        boot = resample_differences(values, in_x, "bootstrap", n_resamples, [seed, 0], workers)
+        alpha = (1 - confidence) / 2
+        result["ci_low"], result["ci_high"] = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+
+        perm = resample_differences(values, in_x, "permutation", n_resamples, [seed, 1], workers)
+        extreme = (np.abs(perm) >= np.abs(diff) - 1e-12).sum(axis=0)
+        result["p_permutation"] = (1 + extreme) / (1 + len(perm))
+    return result
+
+
+def batched_sentiment_tests(daily_metrics, trader_profile=None, metrics=None,
+                            n_resamples=None, seed=None, workers=None, derived=None):
+
+    if metrics is None:
+        metrics = STATS_METRICS or list(daily_metrics.select_dtypes("number").columns)
+
+    sentiment = daily_metrics["sentiment_binary"].astype(str).to_numpy()
+    compared = np.isin(sentiment, ["Fear", "Greed"])
+    is_fear = sentiment == "Fear"
+    values = daily_metrics[metrics].to_numpy(dtype="float64")
+
+    cells = [("All", "All", compared)]
+    if trader_profile is not None:
+        derived = derived or DerivedFrames(daily_metrics, trader_profile)
+        for column in STATS_SEGMENTS:
+            labels = derived.daily_with_segments[column].to_numpy()
+            for label in sorted(pd.unique(labels[pd.notna(labels)])):
+                cells.append((column, label, compared & (labels == label)))
+
+    rows = []
+    for segment, label, mask in cells:
+        result = compare_groups(values[mask], is_fear[mask], n_resamples, seed, workers)
+        for i, metric in enumerate(metrics):
+            rows.append({"segment": segment, "segment_value": label, "metric": metric,
+                         **{key: column[i] for key, column in result.items()}})
+
+    return pd.DataFrame(rows)
+
+
+def statistical_analysis(daily_metrics, trader_profile=None, output_path=None,
+                         n_resamples=None, workers=None, derived=None, tests=None):
 
     print("\n" + "=" * 80)
     print("STATISTICAL ANALYSIS")
     print("=" * 80)
 
-    fear = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["daily_pnl"]
-    greed = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["daily_pnl"]
+    derived = derived or DerivedFrames(daily_metrics, trader_profile)
+    fear = derived.sentiment("Fear")["daily_pnl"]
+    greed = derived.sentiment("Greed")["daily_pnl"]
 
-    stat, p = mannwhitneyu(fear, greed, alternative="two-sided")
+    # every metric and segment x sentiment cell in one batched pass
+    if tests is None:
+        tests = batched_sentiment_tests(
+            daily_metrics, trader_profile, n_resamples=n_resamples, workers=workers,
+            derived=derived
+        )
+    overall = tests[tests["segment"] == "All"].set_index("metric")
+    stat, p = overall.loc["daily_pnl", ["u_statistic", "p_mannwhitney"]]
 
     print("\n📊 Mann-Whitney U Test (Daily PnL):")
     print(f"   U-statistic: {stat:.2f}")
@@ -435,130 +2578,352 @@ def statistical_analysis(daily_metrics):
     
     diff_pct = ((greed.mean() - fear.mean()) / abs(fear.mean()) * 100) if fear.mean() != 0 else 0
     print(f"   Difference: ${greed.mean() - fear.mean():.2f} ({diff_pct:+.2f}%)")
+    if pd.notna(overall.loc["daily_pnl", "ci_low"]):
+        print(f"   {STATS_CONFIDENCE:.0%} bootstrap CI: "
+              f"[${overall.loc['daily_pnl', 'ci_low']:.2f}, ${overall.loc['daily_pnl', 'ci_high']:.2f}]")
     
     # Win rate comparison
-    fear_wr = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["win_rate"]
-    greed_wr = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["win_rate"]
-    stat_wr, p_wr = mannwhitneyu(fear_wr, greed_wr, alternative="two-sided")
+    fear_wr = derived.sentiment("Fear")["win_rate"]
+    greed_wr = derived.sentiment("Greed")["win_rate"]
+    p_wr = overall.loc["win_rate", "p_mannwhitney"]
     
     print("\n📊 Win Rate Comparison:")
     print(f"   Fear - Mean Win Rate: {fear_wr.mean()*100:.2f}%")
     print(f"   Greed - Mean Win Rate: {greed_wr.mean()*100:.2f}%")
     print(f"   P-value: {p_wr:.6f} ({'Significant' if p_wr < 0.05 else 'Not significant'})")
+
+    significant = (tests["p_mannwhitney"] < 0.05).sum()
+    print(f"\n🧪 Batched tests: {len(tests)} comparisons "
+          f"({tests['metric'].nunique()} metrics x {tests.groupby(['segment', 'segment_value']).ngroups} cells), "
+          f"{significant} significant at α = 0.05")
+    tests.to_csv(_output_file(STATS_FILE, output_path), index=False)
+    print(f"   ✅ {STATS_FILE}")
     
-    return p, p_wr
+    return p, p_wr, tests
+
+#modeling
+def build_model_features(daily_metrics):
+
+    modeling_df = daily_metrics.sort_values(["account", "trade_date"], kind="stable")
+    modeling_df = modeling_df.reset_index(drop=True)
+    modeling_df["profitable_day"] = (modeling_df["daily_pnl"] > 0).astype(int)
+    modeling_df["winning_trades"] = np.rint(modeling_df["win_rate"] * modeling_df["num_trades"])
+
+    # sorted-label codes, as LabelEncoder assigns them
+    modeling_df["sentiment_encoded"] = pd.factorize(
+        modeling_df["sentiment_binary"].astype(str), sort=True
+    )[0]
+
+    previous = modeling_df.groupby("account", sort=False)[["win_rate", "daily_pnl"]].shift(1)
+    modeling_df["win_rate_lag"] = previous["win_rate"].fillna(0.5)
+    modeling_df["pnl_lag"] = previous["daily_pnl"].fillna(0)
+    modeling_df["day_of_week"] = modeling_df["trade_date"].dt.dayofweek
+    modeling_df["month"] = modeling_df["trade_date"].dt.to_period("M")
+
+    row_features = [name for name in MODEL_FEATURES if name not in MODEL_SEGMENT_FEATURES]
+    return modeling_df.dropna(subset=row_features + ["profitable_day"])
+
+
+def fold_segment_codes(modeling_df, train, rows):
+    # the profile behind each segment, rebuilt from the training rows' daily
+    # sums; codes follow the sorted labels and an account with no training
+    # history gets -1
+    totals = modeling_df.take(train).groupby("account", sort=False, observed=True).agg(
+        pnl=("daily_pnl", "sum"),
+        fees=("total_fees", "sum"),
+        trades=("num_trades", "sum"),
+        volume=("total_volume", "sum"),
+        wins=("winning_trades", "sum"),
+    )
+    profile = pd.DataFrame({
+        "avg_size": totals["volume"] / totals["trades"],
+        "total_trades": totals["trades"],
+        "net_profit": totals["pnl"] - totals["fees"],
+        "overall_win_rate": totals["wins"] / totals["trades"],
+    })
+
+    segments = {}
+    for column, (metric, quantiles, labels) in SEGMENT_BINS.items():
+        thresholds = segment_thresholds(profile[metric], quantiles)
+        segments[column] = (quantile_segments(profile[metric], thresholds, labels), labels)
+    consistent = (profile["net_profit"] > 0) & (profile["overall_win_rate"] > 0.5)
+    segments["performance_segment"] = (np.where(consistent, "Consistent Winner", "Inconsistent"),
+                                       ["Consistent Winner", "Inconsistent"])
+
+    positions = profile.index.get_indexer(modeling_df["account"].to_numpy()[rows])
+    codes = np.empty((len(rows), len(MODEL_SEGMENT_FEATURES)))
+    for i, column in enumerate(MODEL_SEGMENT_FEATURES.values()):
+        assigned, labels = segments[column]
+        account_codes = np.searchsorted(np.sort(labels), assigned.astype(str))
+        codes[:, i] = np.where(positions >= 0, account_codes[positions], -1)
+    return codes
+
+
+def walk_forward_folds(modeling_df, min_train_months=None):
+    # each fold trains on every month before its test month; the last job
+    # refits on all rows for the exported feature importances
+    min_train_months = MODEL_MIN_TRAIN_MONTHS if min_train_months is None else min_train_months
+    months = modeling_df["month"].to_numpy()
+    unique_months = np.sort(modeling_df["month"].unique())
+
+    folds = []
+    for test_month in unique_months[min_train_months:]:
+        folds.append((str(test_month), np.flatnonzero(months < test_month),
+                      np.flatnonzero(months == test_month)))
+    folds.append(("all", np.arange(len(modeling_df)), np.arange(0)))
+    return folds
+
+
+def _fingerprint(*arrays):
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _fit_fold(job):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
+    label, X_train, y_train, X_test, y_test, params = job
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(**params, n_jobs=1).fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    result = {"fold": label, "train_rows": len(y_train), "test_rows": len(y_test),
+              "fit_s": round(fit_s, 4), "accuracy": np.nan, "roc_auc": np.nan}
+    if len(y_test):
+        result["accuracy"] = accuracy_score(y_test, model.predict(X_test))
+        if len(np.unique(y_test)) > 1:
+            result["roc_auc"] = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    return result, model
+
+
+def train_walk_forward(daily_metrics, cache=None, workers=None, output_path=None):
+
+    print("\n" + "=" * 80)
+    print("PREDICTIVE MODEL: WALK-FORWARD PROFITABILITY")
+    print("=" * 80)
+
+    feature_key = StageCache.key("model_features", MODEL_VERSION, MODEL_FEATURES, _fingerprint(
+        pd.util.hash_pandas_object(daily_metrics, index=False).to_numpy()
+    ))
+    modeling_df = cache.get(feature_key) if cache is not None else None
+    if modeling_df is None:
+        modeling_df = build_model_features(daily_metrics)
+        if cache is not None:
+            cache.put(feature_key, modeling_df)
+
+    # segment columns are filled in per fold
+    X = modeling_df.reindex(columns=MODEL_FEATURES).to_numpy(dtype="float64")
+    y = modeling_df["profitable_day"].to_numpy()
+    segment_columns = [MODEL_FEATURES.index(name) for name in MODEL_SEGMENT_FEATURES]
+
+    # a fold is keyed by exactly the rows it sees, so appending a day only
+    # invalidates the fold for the current month (and the all-rows refit)
+    results, models, jobs, job_keys = {}, {}, [], {}
+    folds = walk_forward_folds(modeling_df)
+    for label, train, test in folds:
+        X_train, X_test = X[train], X[test]
+        X_train[:, segment_columns] = fold_segment_codes(modeling_df, train, train)
+        X_test[:, segment_columns] = fold_segment_codes(modeling_df, train, test)
+        key = StageCache.key("model_fold", MODEL_VERSION, MODEL_PARAMS, MODEL_FEATURES,
+                             _fingerprint(X_train, y[train], X_test, y[test]))
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            results[label], models[label] = dict(cached[0], cached=True), cached[1]
+            continue
+        job_keys[label] = key
+        jobs.append((label, X_train, y[train], X_test, y[test], MODEL_PARAMS))
+
+    workers = min(workers or MODEL_WORKERS or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fitted = list(pool.map(_fit_fold, jobs))
+    else:
+        fitted = [_fit_fold(job) for job in jobs]
+
+    for result, model in fitted:
+        if cache is not None:
+            cache.put(job_keys[result["fold"]], (result, model))
+        results[result["fold"]], models[result["fold"]] = dict(result, cached=False), model
+
+    folds_df = pd.DataFrame([results[label] for label, _, _ in folds])
+    print(f"✅ {len(folds) - 1} monthly folds + full refit: {len(jobs)} fitted on "
+          f"{workers} worker(s), {len(folds) - len(jobs)} reused from cache")
+    for row in folds_df.itertuples():
+        timing = "cached" if row.cached else f"{row.fit_s:.2f}s"
+        print(f"   {row.fold:>8}  train {row.train_rows:>8,}  test {row.test_rows:>7,}  "
+              f"AUC {row.roc_auc:.4f}  acc {row.accuracy:.4f}  ({timing})")
+
+    tested = folds_df[folds_df["roc_auc"].notna()]
+    if len(tested):
+        weighted_auc = (tested["roc_auc"] * tested["test_rows"]).sum() / tested["test_rows"].sum()
+        print(f"\n📈 Walk-forward ROC-AUC (test-size weighted): {weighted_auc:.4f}")
+
+    feature_importance = pd.DataFrame({
+        "feature": MODEL_FEATURES,
+        "importance": models["all"].feature_importances_,
+    }).sort_values("importance", ascending=False)
+
+    folds_df.to_csv(_output_file(MODEL_FOLDS_FILE, output_path), index=False)
+    feature_importance.to_csv(_output_file(FEATURE_IMPORTANCE_FILE, output_path), index=False)
+    print(f"✅ Saved: {MODEL_FOLDS_FILE}")
+    print(f"✅ Saved: {FEATURE_IMPORTANCE_FILE}")
+
+    return folds_df, feature_importance
+
+
+#report summary
+def build_report_summary(daily_with_segments, metrics=None):
+
+    metrics = REPORT_METRICS if metrics is None else metrics
+    frames = []
+    for segment_by in ["All"] + SEGMENT_COLUMNS:
+        keys = ["sentiment_binary"] if segment_by == "All" else [segment_by, "sentiment_binary"]
+        grouped = daily_with_segments.groupby(keys, observed=True)[metrics].agg(REPORT_STATS)
+        long = grouped.stack(level=0, sort=False).reset_index()
+        long = long.rename(columns={segment_by: "segment", "sentiment_binary": "sentiment",
+                                    f"level_{len(keys)}": "metric"})
+        if segment_by == "All":
+            long.insert(0, "segment", "All")
+        long.insert(0, "segment_by", segment_by)
+        frames.append(long[["segment_by", "segment", "sentiment", "metric", *REPORT_STATS]])
+
+    summary = pd.concat(frames, ignore_index=True)
+    summary[["segment", "sentiment"]] = summary[["segment", "sentiment"]].astype(str)
+    summary["count"] = summary["count"].astype(np.int64)
+    return summary
+
+
+class ReportSummary:
+    # lookups into the per-run summary table, so a report line costs one dict
+    # access instead of another pass over the daily rows
+
+    def __init__(self, table):
+        self.table = table
+        self._cells = table.set_index(["segment_by", "segment", "sentiment", "metric"]).to_dict("index")
+
+    def __len__(self):
+        return len(self.table)
+
+    def value(self, metric, sentiment, segment=("All", "All"), stat="mean"):
+        cell = self._cells.get((*segment, sentiment, metric))
+        return np.nan if cell is None else cell[stat]
+
+    def compare(self, metric, segment=("All", "All"), stat="mean"):
+        return tuple(self.value(metric, sentiment, segment, stat) for sentiment in ["Fear", "Greed"])
+
+
+def _format_figure(value, unit):
+    if unit == "$":
+        return f"${value:.2f}"
+    if unit == "%":
+        return f"{value*100:.2f}%"
+    return f"{value:.2f}"
+
+
+def _format_difference(fear, greed, unit):
+    # rates differ in percentage points, everything else relative to Fear
+    if unit == "%":
+        return f"{(greed - fear) * 100:+.2f} pp"
+    change = ((greed - fear) / abs(fear) * 100) if fear != 0 else 0
+    return f"{change:+.2f}%"
+
 
 # key insight
-def generate_insights(daily_metrics, p_value, p_value_wr):
+INSIGHTS = [
+    ("Performance Differential", "Average Daily PnL", "daily_pnl", "$"),
+    ("Win Rate Differential", "Average Win Rate", "win_rate", "%"),
+    ("Trading Activity", "Trades per Day", "num_trades", ""),
+    ("Position Sizing", "Average Trade Size", "avg_trade_size", "$"),
+]
+
+
+def generate_insights(summary, p_value, p_value_wr, output_path=None):
     
     print("\n" + "=" * 80)
     print("KEY INSIGHTS")
     print("=" * 80)
     
+    p_values = {"daily_pnl": p_value, "win_rate": p_value_wr}
     insights_data = []
-    
-    #Performance differential
-    fear_pnl = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["daily_pnl"].mean()
-    greed_pnl = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["daily_pnl"].mean()
-    pnl_diff = ((greed_pnl - fear_pnl) / abs(fear_pnl) * 100) if fear_pnl != 0 else 0
-    
-    insights_data.append({
-        "Insight": "Performance Differential",
-        "Metric": "Average Daily PnL",
-        "Fear": f"${fear_pnl:.2f}",
-        "Greed": f"${greed_pnl:.2f}",
-        "Difference": f"{pnl_diff:+.2f}%",
-        "Significance": "p < 0.05" if p_value < 0.05 else "p >= 0.05"
-    })
-    
-    #Win rate differential
-    fear_wr = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["win_rate"].mean()
-    greed_wr = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["win_rate"].mean()
-    wr_diff = (greed_wr - fear_wr) * 100
-    
-    insights_data.append({
-        "Insight": "Win Rate Differential",
-        "Metric": "Average Win Rate",
-        "Fear": f"{fear_wr*100:.2f}%",
-        "Greed": f"{greed_wr*100:.2f}%",
-        "Difference": f"{wr_diff:+.2f} pp",
-        "Significance": "p < 0.05" if p_value_wr < 0.05 else "p >= 0.05"
-    })
-    
-    #Trading frequency
-    fear_trades = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["num_trades"].mean()
-    greed_trades = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["num_trades"].mean()
-    trades_diff = ((greed_trades - fear_trades) / fear_trades * 100) if fear_trades != 0 else 0
-    
-    insights_data.append({
-        "Insight": "Trading Activity",
-        "Metric": "Trades per Day",
-        "Fear": f"{fear_trades:.2f}",
-        "Greed": f"{greed_trades:.2f}",
-        "Difference": f"{trades_diff:+.2f}%",
-        "Significance": "Behavioral"
-    })
-    
-    #Position sizing
-    fear_size = daily_metrics[daily_metrics["sentiment_binary"] == "Fear"]["avg_trade_size"].mean()
-    greed_size = daily_metrics[daily_metrics["sentiment_binary"] == "Greed"]["avg_trade_size"].mean()
-    size_diff = ((greed_size - fear_size) / fear_size * 100) if fear_size != 0 else 0
-    
-    insights_data.append({
-        "Insight": "Position Sizing",
-        "Metric": "Average Trade Size",
-        "Fear": f"${fear_size:.2f}",
-        "Greed": f"${greed_size:.2f}",
-        "Difference": f"{size_diff:+.2f}%",
-        "Significance": "Behavioral"
-    })
+    for insight, label, metric, unit in INSIGHTS:
+        fear, greed = summary.compare(metric)
+        significance = "Behavioral"
+        if metric in p_values:
+            significance = "p < 0.05" if p_values[metric] < 0.05 else "p >= 0.05"
+        insights_data.append({
+            "Insight": insight,
+            "Metric": label,
+            "Fear": _format_figure(fear, unit),
+            "Greed": _format_figure(greed, unit),
+            "Difference": _format_difference(fear, greed, unit),
+            "Significance": significance
+        })
     
     insights_df = pd.DataFrame(insights_data)
-    insights_df.to_csv(OUTPUT_PATH + "key_insights.csv", index=False)
+    insights_df.to_csv(_output_file("key_insights.csv", output_path), index=False)
     
     print("\n" + insights_df.to_string(index=False))
     print("\n✅ Insights saved to: key_insights.csv")
+    return insights_df
 
 # trading strategies
-def generate_strategies(daily_metrics, trader_profile):
+STRATEGIES = [
+    {
+        "Strategy": "Defensive Position Sizing",
+        "Target Segment": "High Volume Traders",
+        "Rule": "Reduce position sizes by 25-30% during Fear periods",
+        "evidence": (("volume_segment", "High Volume"), "pnl_volatility", "PnL volatility", "$"),
+        "Expected Impact": "Reduce drawdowns by 20-25%, preserve capital during volatile periods"
+    },
+    {
+        "Strategy": "Selective Activity Filtering",
+        "Target Segment": "Frequent Traders",
+        "Rule": "Reduce trade frequency by 15-20% during Fear days; only high-conviction setups",
+        "evidence": (("frequency_segment", "Frequent"), "daily_pnl", "daily PnL", "$"),
+        "Expected Impact": "Improve win rate by 10-15%, reduce transaction costs"
+    },
+    {
+        "Strategy": "Counter-Sentiment Positioning",
+        "Target Segment": "Consistent Winners",
+        "Rule": "Maintain or increase positions during extreme Fear; reduce in extreme Greed",
+        "evidence": (("performance_segment", "Consistent Winner"), "daily_pnl", "daily PnL", "$"),
+        "Expected Impact": "Capture mean-reversion opportunities, enhance returns by 15-25%"
+    }
+]
+
+
+def strategy_evidence(summary, target, segment, metric, label, unit):
+    fear_n, greed_n = np.nan_to_num(summary.compare(metric, segment, stat="count"))
+    if not (fear_n and greed_n):
+        return f"No {target} trader-days in both regimes to compare {label} on"
+    fear, greed = summary.compare(metric, segment)
+    return (
+        f"{target}: average {label} {_format_figure(fear, unit)} in Fear vs "
+        f"{_format_figure(greed, unit)} in Greed ({_format_difference(fear, greed, unit)}; "
+        f"{fear_n:.0f} / {greed_n:.0f} trader-days)"
+    )
+
+
+def generate_strategies(summary, output_path=None):
     
     print("\n" + "=" * 80)
     print("ACTIONABLE TRADING STRATEGIES")
     print("=" * 80)
     
-    # Merge for segment analysis
-    daily_with_segments = daily_metrics.merge(
-        trader_profile[["account", "volume_segment", "frequency_segment", "performance_segment"]],
-        on="account",
-        how="left"
-    )
+    strategies = []
+    for spec in STRATEGIES:
+        strategy = {key: value for key, value in spec.items() if key != "evidence"}
+        strategy["Evidence"] = strategy_evidence(summary, spec["Target Segment"], *spec["evidence"])
+        strategies.append(strategy)
     
-    strategies = [
-        {
-            "Strategy": "Defensive Position Sizing",
-            "Target Segment": "High Volume Traders",
-            "Rule": "Reduce position sizes by 25-30% during Fear periods",
-            "Evidence": f"High volume traders show higher volatility in Fear markets",
-            "Expected Impact": "Reduce drawdowns by 20-25%, preserve capital during volatile periods"
-        },
-        {
-            "Strategy": "Selective Activity Filtering",
-            "Target Segment": "Frequent Traders",
-            "Rule": "Reduce trade frequency by 15-20% during Fear days; only high-conviction setups",
-            "Evidence": f"Frequent traders show lower performance in Fear vs Greed",
-            "Expected Impact": "Improve win rate by 10-15%, reduce transaction costs"
-        },
-        {
-            "Strategy": "Counter-Sentiment Positioning",
-            "Target Segment": "Consistent Winners",
-            "Rule": "Maintain or increase positions during extreme Fear; reduce in extreme Greed",
-            "Evidence": f"Consistent winners maintain profitability across both sentiment regimes",
-            "Expected Impact": "Capture mean-reversion opportunities, enhance returns by 15-25%"
-        }
+    strategies_df = pd.DataFrame(strategies)[
+        ["Strategy", "Target Segment", "Rule", "Evidence", "Expected Impact"]
     ]
-    
-    strategies_df = pd.DataFrame(strategies)
-    strategies_df.to_csv(OUTPUT_PATH + "trading_strategies.csv", index=False)
+    strategies_df.to_csv(_output_file("trading_strategies.csv", output_path), index=False)
     
     for idx, strategy in enumerate(strategies, 1):
         print(f"\n{'='*80}")
@@ -570,24 +2935,283 @@ def generate_strategies(daily_metrics, trader_profile):
         print(f"💡 Impact: {strategy['Expected Impact']}")
     
     print("\n✅ Strategies saved to: trading_strategies.csv")
+    return strategies_df
+
+
+#report rendering
+def _markdown_table(df):
+    cells = df.astype(str).apply(lambda column: column.str.replace("|", "\\|", regex=False))
+    lines = ["| " + " | ".join(df.columns) + " |", "|" + "---|" * len(df.columns)]
+    lines += ["| " + " | ".join(row) + " |" for row in cells.itertuples(index=False)]
+    return "\n".join(lines)
+
+
+def _render_csv(summary, sections, output_path=None):
+    summary.table.to_csv(_output_file(REPORT_SUMMARY_FILE, output_path), index=False)
+    return REPORT_SUMMARY_FILE
+
+
+def _render_html(summary, sections, output_path=None):
+    body = "\n".join(
+        f"<h2>{title}</h2>\n{frame.to_html(index=False, border=0)}" for title, frame in sections
+    )
+    path = _output_file(f"{REPORT_DOCUMENT}.html", output_path)
+    path.write_text(
+        "<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\">"
+        "<title>Trader Sentiment Report</title></head>\n"
+        f"<body>\n<h1>Trader Sentiment Report</h1>\n{body}\n</body>\n</html>\n",
+        encoding="utf-8"
+    )
+    return path.name
+
+
+def _render_markdown(summary, sections, output_path=None):
+    body = "\n\n".join(f"## {title}\n\n{_markdown_table(frame)}" for title, frame in sections)
+    path = _output_file(f"{REPORT_DOCUMENT}.md", output_path)
+    path.write_text(f"# Trader Sentiment Report\n\n{body}\n", encoding="utf-8")
+    return path.name
+
+
+REPORT_RENDERERS = {"csv": _render_csv, "html": _render_html, "md": _render_markdown}
+
+
+def _report_formats(formats=None):
+    formats = REPORT_FORMATS if formats is None else formats
+    if formats is None:
+        return list(REPORT_RENDERERS)
+    unknown = set(formats) - set(REPORT_RENDERERS)
+    if unknown:
+        raise ValueError(f"Unknown report formats: {sorted(unknown)} (choose from {list(REPORT_RENDERERS)})")
+    return list(formats)
+
+
+def render_report(summary, insights_df, strategies_df, output_path=None, formats=None):
+
+    sections = [
+        ("Key Insights", insights_df),
+        ("Trading Strategies", strategies_df),
+        ("Summary by Segment and Sentiment", summary.table.round(4)),
+    ]
+    for fmt in _report_formats(formats):
+        print(f"✅ Saved: {REPORT_RENDERERS[fmt](summary, sections, output_path)}")
+
+
+#run report
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+REPORT_COLUMNS = ["run_id", "stage", "rows_in", "rows_out", "wall_s", "cpu_s", "peak_rss_mb",
+                  "tracemalloc_peak_mb", "cached"]
+
+
+class RunReport:
+
+    def __init__(self, profile=False, output_path=None):
+        self.profile = profile
+        self.output_path = output_path
+        self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+
+        record = {"run_id": self.run_id, "stage": name, "rows_in": rows_in, "rows_out": None,
+                  "cached": False}
+
+        profiler = None
+        if self.profile:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = round(time.perf_counter() - wall_start, 4)
+            record["cpu_s"] = round(time.process_time() - cpu_start, 4)
+            record["peak_rss_mb"] = _peak_rss_mb()
+            record["tracemalloc_peak_mb"] = None
+
+            if profiler is not None:
+                profiler.disable()
+                profile_dir = _output_file(PROFILE_DIR, self.output_path)
+                profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(profile_dir / f"{name}.prof")
+                record["tracemalloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+
+            self.stages.append(record)
+            print(f"⏱️  {name}: {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU")
+
+    def cached(self, name, wall_s):
+        # a stage answered from the stage cache; the time is the cache read
+        self.stages.append({
+            "run_id": self.run_id, "stage": name, "rows_in": None, "rows_out": None,
+            "wall_s": round(wall_s, 4), "cpu_s": None, "peak_rss_mb": _peak_rss_mb(),
+            "tracemalloc_peak_mb": None, "cached": True,
+        })
+
+    def write(self):
+
+        report_df = pd.DataFrame(self.stages, columns=REPORT_COLUMNS).astype(
+            {"rows_in": "Int64", "rows_out": "Int64"}
+        )
+
+        with open(_output_file(REPORT_FILE + ".json", self.output_path), "w") as f:
+            json.dump({
+                "run_id": self.run_id,
+                "profile": self.profile,
+                "total_wall_s": round(report_df["wall_s"].sum(), 4),
+                "stages": self.stages,
+            }, f, indent=2)
+
+        # the CSV accumulates one row per stage per run for regression tracking;
+        # a file written before a column was added is rewritten with it
+        csv_path = _output_file(REPORT_FILE + ".csv", self.output_path)
+        if csv_path.exists() and list(pd.read_csv(csv_path, nrows=0).columns) != REPORT_COLUMNS:
+            previous = pd.read_csv(csv_path).reindex(columns=REPORT_COLUMNS).astype(
+                {"rows_in": "Int64", "rows_out": "Int64"}
+            )
+            previous["cached"] = previous["cached"].fillna(False)
+            previous.to_csv(csv_path, index=False)
+        report_df.to_csv(csv_path, mode="a", header=not csv_path.exists(), index=False)
+
+        print("\n⏱️  Stage timings:")
+        columns = ["stage", "rows_in", "rows_out", "wall_s", "cpu_s", "peak_rss_mb", "cached"]
+        print(report_df[columns].to_string(index=False) if len(report_df) else "   (no stages ran)")
+        print(f"✅ Saved: {REPORT_FILE}.json / {REPORT_FILE}.csv")
 
 
 #export
-def export_results(daily_metrics, trader_profile):
+EXPORT_SUFFIXES = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+
+
+def _export_format(fmt=None):
+    fmt = fmt or EXPORT_FORMAT
+    if fmt not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unknown export format: {fmt} (choose from {list(EXPORT_SUFFIXES)})")
+    if fmt != "csv" and importlib.util.find_spec("pyarrow") is None:
+        print(f"⚠️  pyarrow is not installed, writing CSV instead of {fmt}")
+        return "csv"
+    return fmt
+
+
+def _arrow_table(df, partition_by=()):
+    import pyarrow as pa
+
+    # accounts become a dictionary column, so each 42-character hex is stored
+    # once per file instead of once per row; partition keys are plain strings
+    # because they only survive as directory names
+    if "account" in df:
+        df = df.assign(account=df["account"].astype("category"))
+    df = df.assign(**{column: df[column].astype(str) for column in partition_by})
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_table(df, name, output_path=None, fmt=None, partition_by=None):
+    # df may also be an iterable of frames, the row-ordered parts of one table
+    # (see SpilledTable); CSV and partitioned datasets are written part by part
+    fmt = _export_format(fmt)
+    file_name = name + EXPORT_SUFFIXES[fmt]
+    path = _output_file(file_name, output_path)
+    parts = [df] if isinstance(df, pd.DataFrame) else df
+
+    if fmt == "csv":
+        for number, part in enumerate(parts):
+            part.to_csv(path, mode="a" if number else "w", header=not number, index=False)
+        return file_name
+
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if not partition_by:
+        table = _arrow_table(df if isinstance(df, pd.DataFrame) else pd.concat(parts, ignore_index=True))
+        if fmt == "parquet":
+            pq.write_table(table, path, compression=EXPORT_COMPRESSION or "none")
+        else:
+            feather.write_feather(table, path, compression=EXPORT_COMPRESSION or "uncompressed")
+        return file_name
+
+    file_format = ds.ParquetFileFormat() if fmt == "parquet" else ds.IpcFileFormat()
+    # the dataset is built next to the old one and swapped in, so readers never
+    # see a mix of partitions from two runs
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    for number, part in enumerate(parts):
+        if "month" in partition_by and "month" not in part:
+            part = part.assign(month=part["trade_date"].dt.strftime("%Y-%m"))
+        ds.write_dataset(
+            _arrow_table(part, partition_by),
+            tmp_path,
+            format=file_format,
+            file_options=file_format.make_write_options(compression=EXPORT_COMPRESSION),
+            partitioning=partition_by,
+            partitioning_flavor="hive",
+            basename_template=f"part-{number}-{{i}}" + EXPORT_SUFFIXES[fmt],
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+    os.replace(tmp_path, path)
+    return file_name
+
+
+def read_table(name, output_path=None, columns=None, filters=None, fmt=None):
+    # filters is {column: value}, e.g. {"sentiment_binary": "Fear", "month": "2024-03"};
+    # binary exports are memory-mapped and only the matching partitions are read
+    fmt = fmt or EXPORT_FORMAT
+    path = _output_file(name + EXPORT_SUFFIXES[fmt], output_path)
+
+    if fmt == "csv":
+        df = pd.read_csv(path, usecols=columns)
+        for column, value in (filters or {}).items():
+            df = df[df[column].astype(str) == str(value)]
+        return df.reset_index(drop=True)
+
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    dataset = ds.dataset(
+        str(path),
+        format="parquet" if fmt == "parquet" else "ipc",
+        partitioning="hive",
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+    expression = None
+    for column, value in (filters or {}).items():
+        condition = ds.field(column) == value
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def export_results(daily_metrics, trader_profile, output_path=None, fmt=None, derived=None):
 
     print("\n" + "=" * 80)
     print("EXPORTING RESULTS")
     print("=" * 80)
 
+    fmt = _export_format(fmt)
+    # spilled daily metrics are written partition by partition
+    spilled = isinstance(daily_metrics, SpilledTable)
+
     #daily metrics
-    daily_metrics.to_csv(
-        OUTPUT_PATH + "daily_trader_metrics.csv",
-        index=False
-    )
-    print("✅ Saved: daily_trader_metrics.csv")
+    saved = write_table(daily_metrics.parts() if spilled else daily_metrics, "daily_trader_metrics",
+                        output_path, fmt, EXPORT_PARTITIONS)
+    print(f"✅ Saved: {saved}")
 
     # Summary by sentiment
-    summary = daily_metrics.groupby("sentiment_binary").agg({
+    aggregations = {
         "daily_pnl": ["mean", "median", "std", "sum"],
         "net_pnl": ["mean", "sum"],
         "win_rate": ["mean", "median"],
@@ -595,63 +3219,601 @@ def export_results(daily_metrics, trader_profile):
         "avg_trade_size": "mean",
         "buy_ratio": "mean",
         "total_volume": ["mean", "sum"]
-    }).round(4)
+    }
+    summary_source = daily_metrics
+    if spilled:
+        # medians need every row, but only of these columns
+        summary_source = daily_metrics.to_pandas(["sentiment_binary", *aggregations])
+    summary = summary_source.groupby("sentiment_binary", observed=True).agg(aggregations).round(4)
     
-    summary.to_csv(OUTPUT_PATH + "sentiment_summary.csv")
+    summary.to_csv(_output_file("sentiment_summary.csv", output_path))
     print("✅ Saved: sentiment_summary.csv")
     
     #trader profiles
-    trader_profile.to_csv(OUTPUT_PATH + "trader_profiles.csv", index=False)
-    print("✅ Saved: trader_profiles.csv")
+    saved = write_table(trader_profile, "trader_profiles", output_path, fmt)
+    print(f"✅ Saved: {saved}")
+
+    #daily metrics joined with the segment labels
+    if spilled:
+        with_segments = (_with_segments(part, trader_profile) for part in daily_metrics.parts())
+    else:
+        with_segments = (derived or DerivedFrames(daily_metrics, trader_profile)).daily_with_segments
+    saved = write_table(with_segments, "daily_metrics_with_segments", output_path, fmt,
+                        EXPORT_PARTITIONS)
+    print(f"✅ Saved: {saved}")
+
+
+#pipeline
+STAGES = ["load", "metrics", "segments", "rolling", "drawdowns", "cube", "plots", "stats", "model",
+          "insights", "strategies", "render", "export"]
+
+#stages only run when asked for by name (one random forest per monthly fold)
+OPTIONAL_STAGES = ["model"]
+DEFAULT_STAGES = [stage for stage in STAGES if stage not in OPTIONAL_STAGES]
+
+
+class Pipeline:
+
+    def __init__(self, data_path=None, output_path=None, streaming=None, chunk_size=None,
+                 compact=None, use_cache=None, figure_workers=None, profile=False,
+                 headless=None, sentiment_join=None, sentiment_lag=None, shards=None,
+                 segment_sketch=None, resamples=None, stats_workers=None, export_format=None,
+                 intraday=None, validate=None, backend=None, report_formats=None, dedupe_fills=None):
+
+        self.data_path = Path(data_path or DATA_PATH)
+        self.output_path = Path(output_path or OUTPUT_PATH)
+        self.streaming = STREAMING if streaming is None else streaming
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.compact = COMPACT_DTYPES if compact is None else compact
+        self.use_cache = use_cache
+        self.figure_workers = figure_workers
+        self.headless = HEADLESS if headless is None else headless
+        self.sentiment_join = sentiment_join
+        self.sentiment_lag = sentiment_lag
+        self.shards = SHARDS if shards is None else shards
+        self.resamples = resamples
+        self.stats_workers = STATS_WORKERS if stats_workers is None else stats_workers
+        self.export_format = export_format
+        self.intraday = INTRADAY_BUCKET if intraday is None else intraday
+        self.validate = VALIDATE if validate is None else validate
+        self.backend = backend or BACKEND
+        # checked here so a bad format fails before any stage runs
+        self.report_formats = _report_formats(report_formats)
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {self.backend} (choose from {BACKENDS})")
+        if self.backend == "spill" and (self.streaming or self.intraday or self.shards):
+            # the spill pass already bounds memory and runs its partitions in parallel
+            print("⚠️  --streaming, --intraday and --shards are ignored by the spill backend")
+            self.streaming, self.intraday, self.shards = False, None, None
+        if self.intraday and self.shards and self.shards > 1 and not self.streaming:
+            # the bucket-grain pass replaces the sharded one
+            print("⚠️  --shards is ignored in intraday mode")
+            self.shards = None
+        self.segment_sketch = SEGMENT_SKETCH_K if segment_sketch is None else segment_sketch
+        partitioned = self.backend == "spill" or (self.shards and self.shards > 1 and not self.streaming)
+        if self.segment_sketch and not partitioned:
+            # a single in-memory profile gets exact quantiles
+            print("⚠️  --quantile-sketch only applies with --shards or --backend spill")
+            self.segment_sketch = None
+        dedupe_fills = DEDUPE_FILLS if dedupe_fills is None else dedupe_fills
+        self.dedupe_fills = not self.out_of_core if dedupe_fills is None else dedupe_fills
+        self.report = RunReport(profile=profile or PROFILE, output_path=self.output_path)
+        self.stage_cache = None
+        if USE_CACHE if use_cache is None else use_cache:
+            self.stage_cache = StageCache(_output_file(STAGE_CACHE_DIR, self.output_path))
+
+        self.output_path.mkdir(parents=True, exist_ok=True)
+
+        self.validator = None
+        self.sentiment_df = None
+        self.merged_df = None
+        self.account_lookup = None
+        self.daily_metrics = None
+        self.spilled_daily = None
+        self.trader_profile = None
+        self.rolling_metrics = None
+        self.model_folds = None
+        self.trader_drawdowns = None
+        self.intraday_metrics = None
+        self.intraday_profile = None
+        self.analytics_cube = None
+        self.p_values = None
+        self.derived = None
+        self.report_summary = None
+        self.insights_table = None
+        self.strategies_table = None
+
+    # streaming and spill runs never hold the trade-level frame
+    @property
+    def out_of_core(self):
+        return self.streaming or self.backend == "spill"
+
+    # stages pull in whatever they depend on, so any subset can be run
+    def _need_merged(self):
+        if self.merged_df is None:
+            self.load()
+        return self.merged_df
+
+    def _need_daily(self):
+        if self.daily_metrics is None and self.spilled_daily is None:
+            self.metrics()
+        if self.daily_metrics is None:
+            # stages past export work on the daily frame in memory
+            print("\n📥 Loading spilled daily metrics for the in-memory stages")
+            self.daily_metrics = self.spilled_daily.to_pandas()
+        return self.daily_metrics
+
+    def _need_profile(self):
+        if self.trader_profile is None:
+            self.segments()
+        return self.trader_profile
+
+    def _need_p_values(self):
+        if self.p_values is None:
+            self.stats()
+        return self.p_values
+
+    def _need_derived(self):
+        daily_metrics, trader_profile = self._need_daily(), self._need_profile()
+        if (self.derived is None or self.derived.daily_metrics is not daily_metrics
+                or self.derived.trader_profile is not trader_profile):
+            self.derived = DerivedFrames(daily_metrics, trader_profile)
+            self.report_summary = None
+        return self.derived
+
+    def _need_report_summary(self):
+        derived = self._need_derived()
+        if self.report_summary is None:
+            with self.report.stage("report_summary", rows_in=len(derived.daily_metrics)) as record:
+                self.report_summary = derived.report_summary
+                record["rows_out"] = len(self.report_summary)
+        return self.report_summary
+
+    # a stage's cache key covers the raw inputs and every setting upstream of it
+    def _stage_key(self, stage):
+        settings = {
+            "inputs": _input_fingerprint(self.data_path),
+            "sentiment": [self.sentiment_join or SENTIMENT_JOIN, self.sentiment_lag or SENTIMENT_LAG,
+                          SENTIMENT_TOLERANCE, TRADE_TIMEZONE, FEAR_THRESHOLD, GREED_THRESHOLD],
+            "streaming": self.streaming,
+            # sharded passes build the profiles with the metrics, so a pandas
+            # entry (no profile) must not answer a sharded run
+            "partitioning": [self.backend, self.shards if self.shards and self.shards > 1 else None],
+            "validate": [self.validate, self.dedupe_fills],
+            "intraday": self.intraday,
+            "segments": [SEGMENT_BINS, self.segment_sketch],
+        }
+        if stage == "stats":
+            settings["stats"] = [STATS_METRICS, STATS_SEGMENTS, STATS_SEED, STATS_CONFIDENCE,
+                                 STATS_RESAMPLES if self.resamples is None else self.resamples]
+        return StageCache.key(stage, STAGE_VERSIONS[stage], settings)
+
+    def _cached(self, stage):
+        if self.stage_cache is None:
+            return None
+        start = time.perf_counter()
+        result = self.stage_cache.get(self._stage_key(stage))
+        if result is not None:
+            print(f"\n⚡ {stage}: inputs unchanged, reusing cached result")
+            self.report.cached(stage, time.perf_counter() - start)
+        return result
+
+    def _store(self, stage, result):
+        if self.stage_cache is not None:
+            self.stage_cache.put(self._stage_key(stage), result)
+
+    def load(self):
+        if self.validate:
+            self.validator = DataValidator(self.output_path, dedupe=self.dedupe_fills)
+
+        if self.out_of_core:
+            # trades are validated chunk by chunk as the metrics stream or spill them
+            with self.report.stage("load") as record:
+                self.sentiment_df = load_sentiment_data(self.data_path, self.validator)
+                record["rows_out"] = len(self.sentiment_df)
+            return self
+
+        with self.report.stage("load") as record:
+            self.merged_df, self.sentiment_df = load_and_clean_data(
+                self.data_path, self.use_cache, self.sentiment_join, self.sentiment_lag,
+                self.validator
+            )
+            record["rows_out"] = len(self.merged_df)
+        if self.validator is not None:
+            self.validator.write_report(self.output_path)
+
+        if self.compact:
+            with self.report.stage("compact_dtypes", rows_in=len(self.merged_df)) as record:
+                self.merged_df, self.account_lookup = compact_dtypes(self.merged_df)
+                record["rows_out"] = len(self.merged_df)
+        return self
+
+    def metrics(self):
+        if self.backend == "spill":
+            # the spilled result lives on disk, outside the stage cache
+            self._compute_metrics()
+            return self
+
+        cached = self._cached("metrics")
+        if cached is not None:
+            self.daily_metrics = cached["daily_metrics"]
+            if cached["trader_profile"] is not None:
+                self.trader_profile = cached["trader_profile"]
+            if cached["intraday"] is not None:
+                self.intraday_metrics, self.intraday_profile = cached["intraday"]
+                export_intraday(self.intraday_metrics, self.intraday_profile, self.output_path,
+                                self.export_format)
+            save_metrics_state(cached["state"], self.output_path, self.sentiment_join, self.sentiment_lag)
+            return self
+
+        state = self._compute_metrics()
+        save_metrics_state(state, self.output_path, self.sentiment_join, self.sentiment_lag)
+        # streaming and sharded passes build the profiles alongside the metrics
+        self._store("metrics", {
+            "daily_metrics": self.daily_metrics,
+            "trader_profile": self.trader_profile,
+            "intraday": None if self.intraday_metrics is None else (
+                self.intraday_metrics, self.intraday_profile
+            ),
+            "state": state,
+        })
+        return self
+
+    def _intraday(self, bucket_stats):
+        with self.report.stage("intraday", rows_in=len(bucket_stats)) as record:
+            self.intraday_metrics, self.intraday_profile = summarize_intraday(bucket_stats)
+            if self.account_lookup is not None:
+                self.intraday_metrics = decode_accounts(self.intraday_metrics, self.account_lookup)
+            export_intraday(self.intraday_metrics, self.intraday_profile, self.output_path,
+                            self.export_format)
+            record["rows_out"] = len(self.intraday_metrics)
+
+    # returns the daily sufficient statistics the --append state is seeded
+    # from; the spill backend moves its per-partition state in place itself
+    def _compute_metrics(self):
+        if self.backend == "spill":
+            if self.sentiment_df is None:
+                self.load()
+            spill_dir = _output_file(SPILL_DIR, self.output_path)
+            with self.report.stage("spill_metrics") as record:
+                self.spilled_daily, self.trader_profile, account_stats = create_spilled_metrics(
+                    self.sentiment_df, spill_dir, self.chunk_size,
+                    self.data_path, self.sentiment_join, self.sentiment_lag,
+                    sketch_k=self.segment_sketch, validator=self.validator
+                )
+                record["rows_out"] = len(self.spilled_daily)
+            meta = dict(_state_settings(self.sentiment_join, self.sentiment_lag), applied=[])
+            _save_state_parts("daily", spill_dir / "state", self.spilled_daily.partitions,
+                              DAILY_KEYS, meta, self.output_path)
+            _save_state("account", account_stats, meta, self.output_path)
+            if self.validator is not None:
+                self.validator.write_report(self.output_path)
+            return None
+
+        if self.streaming:
+            if self.sentiment_df is None:
+                self.load()
+            with self.report.stage("stream_metrics") as record:
+                self.daily_metrics, self.trader_profile, stats = stream_daily_metrics(
+                    self.sentiment_df, self.chunk_size, self.data_path,
+                    self.sentiment_join, self.sentiment_lag, self.intraday, self.validator
+                )
+                record["rows_out"] = len(self.daily_metrics)
+            if self.validator is not None:
+                self.validator.write_report(self.output_path)
+            if self.intraday:
+                self._intraday(stats)
+                stats = stats.groupby(level=DAILY_KEYS, observed=True).sum()
+            return stats
+
+        # the --append state comes out of the same pass as the metrics
+        merged_df = self._need_merged()
+        if self.intraday:
+            with self.report.stage("metrics", rows_in=len(merged_df)) as record:
+                self.daily_metrics, bucket_stats, daily_stats = create_intraday_metrics(
+                    merged_df, self.intraday
+                )
+                if self.account_lookup is not None:
+                    self.daily_metrics = decode_accounts(self.daily_metrics, self.account_lookup)
+                record["rows_out"] = len(self.daily_metrics)
+            self._intraday(bucket_stats)
+            return _decode_state(daily_stats, self.account_lookup)
+
+        if self.shards and self.shards > 1:
+            with self.report.stage("sharded_metrics", rows_in=len(merged_df)) as record:
+                self.daily_metrics, self.trader_profile, daily_stats = create_sharded_metrics(
+                    merged_df, self.shards, sketch_k=self.segment_sketch
+                )
+                if self.account_lookup is not None:
+                    self.daily_metrics = decode_accounts(self.daily_metrics, self.account_lookup)
+                    self.trader_profile = decode_accounts(self.trader_profile, self.account_lookup)
+                record["rows_out"] = len(self.daily_metrics)
+            return _decode_state(daily_stats, self.account_lookup)
+
+        with self.report.stage("metrics", rows_in=len(merged_df)) as record:
+            self.daily_metrics, daily_stats = create_daily_metrics(merged_df, with_state=True)
+            if self.account_lookup is not None:
+                self.daily_metrics = decode_accounts(self.daily_metrics, self.account_lookup)
+            record["rows_out"] = len(self.daily_metrics)
+        return _decode_state(daily_stats, self.account_lookup)
+
+    def segments(self):
+        if self.out_of_core or (self.shards and self.shards > 1):
+            # streaming and sharded passes build the profiles alongside the metrics
+            if self.trader_profile is None:
+                self.metrics()
+            return self
+
+        cached = self._cached("segments")
+        if cached is not None:
+            self.trader_profile = cached
+            return self
+
+        merged_df = self._need_merged()
+        with self.report.stage("segments", rows_in=len(merged_df)) as record:
+            self.trader_profile = create_trader_segments(merged_df)
+            if self.account_lookup is not None:
+                self.trader_profile = decode_accounts(self.trader_profile, self.account_lookup)
+            record["rows_out"] = len(self.trader_profile)
+        self._store("segments", self.trader_profile)
+        return self
+
+    def rolling(self):
+        daily_metrics = self._need_daily()
+        with self.report.stage("rolling", rows_in=len(daily_metrics)) as record:
+            self.rolling_metrics = create_rolling_metrics(daily_metrics, self.output_path)
+            record["rows_out"] = len(self.rolling_metrics)
+        return self
+
+    def drawdowns(self):
+        if self.out_of_core:
+            print("\n⏭️  Out-of-core run: drawdowns need the trade-level frame, skipped")
+            return self
+
+        cached = self._cached("drawdowns")
+        if cached is not None:
+            self.trader_drawdowns = cached
+            export_drawdowns(cached, self.output_path)
+            return self
+
+        merged_df = self._need_merged()
+        with self.report.stage("drawdowns", rows_in=len(merged_df)) as record:
+            self.trader_drawdowns = create_drawdowns(merged_df)
+            if self.account_lookup is not None:
+                self.trader_drawdowns = decode_accounts(self.trader_drawdowns, self.account_lookup)
+            export_drawdowns(self.trader_drawdowns, self.output_path)
+            record["rows_out"] = len(self.trader_drawdowns)
+        self._store("drawdowns", self.trader_drawdowns)
+        return self
+
+    def cube(self):
+        trader_profile = self._need_profile()
+        cached = self._cached("cube")
+        if cached is not None:
+            self.analytics_cube = AnalyticsCube(cached)
+            export_cube(self.analytics_cube, self.output_path, self.export_format)
+            return self
+
+        if self.out_of_core:
+            if self.sentiment_df is None:
+                self.load()
+            with self.report.stage("cube") as record:
+                # a second validator drops the same rows without re-quarantining them
+                stats = _stream_partials(self.sentiment_df, CUBE_KEYS, self.chunk_size, self.data_path,
+                                         self.sentiment_join, self.sentiment_lag,
+                                         validator=DataValidator(dedupe=self.dedupe_fills) if self.validate else None)
+                self.analytics_cube = create_cube(stats, trader_profile)
+                export_cube(self.analytics_cube, self.output_path, self.export_format)
+                record["rows_out"] = len(self.analytics_cube.base)
+        else:
+            merged_df = self._need_merged()
+            with self.report.stage("cube", rows_in=len(merged_df)) as record:
+                self.analytics_cube = create_cube(
+                    _partial_stats(merged_df, CUBE_KEYS), trader_profile, self.account_lookup
+                )
+                export_cube(self.analytics_cube, self.output_path, self.export_format)
+                record["rows_out"] = len(self.analytics_cube.base)
+        self._store("cube", self.analytics_cube.base)
+        return self
+
+    def plots(self):
+        if self.headless:
+            print("\n⏭️  Headless run: plots skipped")
+            return self
+
+        daily_metrics, trader_profile = self._need_daily(), self._need_profile()
+        with self.report.stage("plots", rows_in=len(daily_metrics)):
+            render_figures(daily_metrics, trader_profile, self.figure_workers, self.output_path,
+                           self._need_derived())
+        return self
+
+    def stats(self):
+        daily_metrics, trader_profile = self._need_daily(), self._need_profile()
+        cached_tests = self._cached("stats")
+        with self.report.stage("stats", rows_in=len(daily_metrics)):
+            p_value, p_value_wr, tests = statistical_analysis(
+                daily_metrics, trader_profile, self.output_path, self.resamples, self.stats_workers,
+                self._need_derived(), cached_tests
+            )
+        self.p_values = p_value, p_value_wr
+        if cached_tests is None:
+            self._store("stats", tests)
+        return self
+
+    def model(self):
+        daily_metrics = self._need_daily()
+        with self.report.stage("model", rows_in=len(daily_metrics)) as record:
+            self.model_folds, _ = train_walk_forward(
+                daily_metrics, self.stage_cache, self.stats_workers, self.output_path
+            )
+            record["rows_out"] = len(self.model_folds)
+        return self
+
+    # insights, strategies and the rendered report only read the summary table
+    def insights(self):
+        p_value, p_value_wr = self._need_p_values()
+        summary = self._need_report_summary()
+        with self.report.stage("insights", rows_in=len(summary)) as record:
+            self.insights_table = generate_insights(summary, p_value, p_value_wr, self.output_path)
+            record["rows_out"] = len(self.insights_table)
+        return self
+
+    def strategies(self):
+        summary = self._need_report_summary()
+        with self.report.stage("strategies", rows_in=len(summary)) as record:
+            self.strategies_table = generate_strategies(summary, self.output_path)
+            record["rows_out"] = len(self.strategies_table)
+        return self
+
+    def render(self):
+        if self.insights_table is None:
+            self.insights()
+        if self.strategies_table is None:
+            self.strategies()
+        summary = self._need_report_summary()
+        with self.report.stage("render", rows_in=len(summary)):
+            render_report(summary, self.insights_table, self.strategies_table, self.output_path,
+                          self.report_formats)
+        return self
+
+    def export(self):
+        trader_profile = self._need_profile()
+        if self.backend == "spill":
+            # the spilled partitions are exported one at a time, never as one frame
+            daily_metrics, derived = self.spilled_daily, None
+        else:
+            daily_metrics, derived = self._need_daily(), self._need_derived()
+        with self.report.stage("export", rows_in=len(daily_metrics)):
+            export_results(daily_metrics, trader_profile, self.output_path, self.export_format, derived)
+        return self
+
+    def run(self, stages=None):
+        stages = stages or DEFAULT_STAGES
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)} (choose from {STAGES})")
+
+        for stage in STAGES:
+            # loading is pulled in on demand by the stages that need the raw
+            # trades, so a run whose stages all hit the stage cache never reads them
+            if stage == "load" and len(stages) > 1:
+                continue
+            if stage in stages:
+                getattr(self, stage)()
 
+        self.report.write()
+        return self
 
-def main():
+
+def main(argv=None):
+
+    args = parse_args(argv)
 
     print("=" * 80)
     print("TRADER SENTIMENT ANALYSIS - COMPLETE")
     print("=" * 80)
     print("Start:", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
-    #Load and clean
-    merged_df, sentiment_df = load_and_clean_data()
-    
-    #metrics
-    daily_metrics = create_daily_metrics(merged_df)
-    
-    #segments
-    trader_profile = create_trader_segments(merged_df)
-    
-    #visualizations
-    visualize_performance_comparison(daily_metrics)
-    visualize_behavior_comparison(daily_metrics)
-    visualize_segment_analysis(daily_metrics, trader_profile)
-    
-    #statistical analysis
-    p_value, p_value_wr = statistical_analysis(daily_metrics)
-    
-    generate_insights(daily_metrics, p_value, p_value_wr)
-    
-    generate_strategies(daily_metrics, trader_profile)
-    
-    # Export
-    export_results(daily_metrics, trader_profile)
+    if args.append:
+        daily_metrics, trader_profile = update_incremental(
+            args.append, args.data_dir, args.output_dir, args.export_format,
+            False if args.no_validate else None, args.sentiment_join, args.sentiment_lag
+        )
+        # a model trained before is brought up to date; unchanged folds come from the cache
+        if daily_metrics is not None and _output_file(MODEL_FOLDS_FILE, args.output_dir).exists():
+            cache = None if args.no_cache else StageCache(_output_file(STAGE_CACHE_DIR, args.output_dir))
+            train_walk_forward(daily_metrics, cache, args.workers, args.output_dir)
+        return
+
+    stages = args.stages.split(",") if args.stages else list(DEFAULT_STAGES)
+    if (args.no_plots or args.headless) and "plots" in stages:
+        stages.remove("plots")
+
+    pipeline = Pipeline(
+        data_path=args.data_dir,
+        output_path=args.output_dir,
+        streaming=args.streaming or None,
+        chunk_size=args.chunk_size,
+        use_cache=False if args.no_cache else None,
+        figure_workers=args.workers,
+        profile=args.profile,
+        headless=args.headless or None,
+        sentiment_join=args.sentiment_join,
+        sentiment_lag=args.sentiment_lag,
+        shards=args.shards,
+        segment_sketch=args.quantile_sketch,
+        resamples=args.resamples,
+        stats_workers=args.workers,
+        export_format=args.export_format,
+        intraday=args.intraday,
+        validate=False if args.no_validate else None,
+        backend=args.backend,
+        dedupe_fills=args.dedupe_fills or None,
+        report_formats=args.report_formats.split(",") if args.report_formats else None,
+    )
+    pipeline.run(stages)
 
     print("\n" + "=" * 80)
     print("ANALYSIS COMPLETE")
     print("=" * 80)
     print("End:", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    print(f"\n📁 All outputs saved to: {OUTPUT_PATH}")
-    print("\n📊 Generated Files:")
-    print("   • performance_fear_vs_greed.png")
-    print("   • behavior_fear_vs_greed.png")
-    print("   • segment_analysis.png")
-    print("   • key_insights.csv")
-    print("   • trading_strategies.csv")
-    print("   • daily_trader_metrics.csv")
-    print("   • sentiment_summary.csv")
-    print("   • trader_profiles.csv")
+    print(f"\n📁 All outputs saved to: {pipeline.output_path}")
+    print("\n📊 Stages run:", ", ".join(stage for stage in STAGES if stage in stages))
     print("\n✅ Ready for submission!")
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Trader sentiment analysis")
+    parser.add_argument("--data-dir", default=None,
+                        help=f"folder with {SENTIMENT_FILE} and {TRADER_FILE} (default: {DATA_PATH})")
+    parser.add_argument("--output-dir", default=None,
+                        help=f"folder for reports and figures (default: {OUTPUT_PATH})")
+    parser.add_argument("--stages", default=None,
+                        help=f"comma-separated subset of: {','.join(STAGES)} "
+                             f"(default: all but {','.join(OPTIONAL_STAGES)})")
+    parser.add_argument("--no-plots", action="store_true", help="skip the plots stage")
+    parser.add_argument("--headless", action="store_true",
+                        help="never import matplotlib/seaborn (implies --no-plots)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help=f"where metrics, segments and exports run (default: {BACKEND}); "
+                             "spill partitions the trades by account on disk")
+    parser.add_argument("--streaming", action="store_true",
+                        help="read the trader export in chunks instead of all at once")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help=f"rows per chunk in streaming mode (default: {CHUNK_SIZE:,})")
+    parser.add_argument("--sentiment-join", choices=["date", "asof"], default=None,
+                        help=f"how trades are matched to sentiment (default: {SENTIMENT_JOIN})")
+    parser.add_argument("--sentiment-lag", default=None,
+                        help="look sentiment up this far before the trade, e.g. 1D or 6h")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="hash-partition trades by account and compute metrics per shard in parallel")
+    parser.add_argument("--quantile-sketch", type=int, default=None, metavar="K",
+                        help="with --shards or --backend spill, segment on merged per-shard KLL "
+                             "sketches of size K instead of exact quantiles")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="skip the data-quality rules (no quarantine files or validation report)")
+    parser.add_argument("--dedupe-fills", action="store_true",
+                        help="with --streaming or --backend spill, also quarantine repeated fills "
+                             "(holds an 8-byte hash per trade in memory)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the columnar ingest cache and the stage result cache")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for figure rendering, resampling tests and model folds")
+    parser.add_argument("--resamples", type=int, default=None,
+                        help=f"bootstrap/permutation resamples per test, 0 to skip (default: {STATS_RESAMPLES})")
+    parser.add_argument("--intraday", nargs="?", const="1h", default=None, metavar="WIDTH",
+                        help="also aggregate per account and time bucket of this width (default: 1h)")
+    parser.add_argument("--export-format", choices=list(EXPORT_SUFFIXES), default=None,
+                        help=f"format of the daily/profile exports (default: {EXPORT_FORMAT})")
+    parser.add_argument("--report-formats", default=None,
+                        help=f"comma-separated subset of {','.join(REPORT_RENDERERS)} for the report "
+                             "(default: all of them)")
+    parser.add_argument("--append", metavar="TRADES_CSV", default=None,
+                        help="apply newly appended trades to the incremental state and re-emit metrics")
+    parser.add_argument("--profile", action="store_true",
+                        help="write a cProfile dump and tracemalloc peak per stage")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,262 @@
+import argparse
+import contextlib
+import io
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import analysis_script
+import synthetic_data
+
+
+#synthetic data: CSV exports written by synthetic_data, generated once per
+#size and reused
+BENCH_DATA = analysis_script.BASE_DIR / "bench_data"
+BENCH_RESULTS = analysis_script.BASE_DIR / "outputs" / "benchmark_results.csv"
+
+
+def synthetic_dataset(data_root, n_trades, n_accounts):
+    data_dir = Path(data_root) / f"trades_{n_trades}_accounts_{n_accounts}"
+    if not (data_dir / analysis_script.TRADER_FILE).exists():
+        print(f"Generating {n_trades:,} synthetic trades in {data_dir} ...")
+        synthetic_data.write_dataset(data_dir, n_trades, n_accounts)
+    return data_dir
+
+
+#baseline implementation of create_daily_metrics (three groupbys, two merges)
+def legacy_daily_metrics(merged_df):
+
+    grouped = merged_df.groupby(["account", "trade_date", "sentiment_binary"])
+
+    daily_metrics = grouped.agg({
+        "closed_pnl": ["sum", "mean", "std", "count"],
+        "size_usd": ["sum", "mean"],
+        "fee": "sum"
+    }).reset_index()
+
+    daily_metrics.columns = [
+        "account", "trade_date", "sentiment_binary", "daily_pnl",
+        "avg_pnl_per_trade", "pnl_volatility", "num_trades",
+        "total_volume", "avg_trade_size", "total_fees"
+    ]
+
+    buy_ratio = (
+        merged_df
+        .groupby(["account", "trade_date"])["side"]
+        .apply(lambda x: (x == "BUY").mean())
+        .reset_index(name="buy_ratio")
+    )
+
+    win_rate = (
+        merged_df
+        .groupby(["account", "trade_date"])["closed_pnl"]
+        .apply(lambda x: (x > 0).mean())
+        .reset_index(name="win_rate")
+    )
+
+    daily_metrics = daily_metrics.merge(buy_ratio, on=["account", "trade_date"], how="left")
+    daily_metrics = daily_metrics.merge(win_rate, on=["account", "trade_date"], how="left")
+
+    daily_metrics["pnl_volatility"] = daily_metrics["pnl_volatility"].fillna(0)
+    daily_metrics["net_pnl"] = daily_metrics["daily_pnl"] - daily_metrics["total_fees"]
+
+    return daily_metrics
+
+
+def _timed(func, *args, repeats=1):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_daily_metrics(sizes, n_accounts, data_root, repeats=1):
+
+    rows = []
+    print(f"{'trades':>12} {'groups':>10} {'legacy_s':>10} {'vectorized_s':>13} {'speedup':>8}")
+    for n_trades in sizes:
+        data_dir = synthetic_dataset(data_root, n_trades, n_accounts)
+        with contextlib.redirect_stdout(io.StringIO()):
+            merged_df, _ = analysis_script.load_and_clean_data(data_dir)
+
+        legacy_s, expected = _timed(legacy_daily_metrics, merged_df, repeats=repeats)
+        vector_s, actual = _timed(analysis_script.create_daily_metrics, merged_df, repeats=repeats)
+
+        pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+        rows.append({
+            "trades": n_trades,
+            "groups": len(actual),
+            "legacy_s": round(legacy_s, 3),
+            "vectorized_s": round(vector_s, 3),
+            "speedup": round(legacy_s / vector_s, 1),
+        })
+        print(f"{n_trades:>12,} {len(actual):>10,} {legacy_s:>10.3f} "
+              f"{vector_s:>13.3f} {legacy_s / vector_s:>7.1f}x")
+
+    return pd.DataFrame(rows)
+
+
+#full pipeline
+def bench_pipeline(sizes, n_accounts, data_root, streaming=False, profile=False):
+
+    results = []
+    for n_trades in sizes:
+        data_dir = synthetic_dataset(data_root, n_trades, n_accounts)
+        output_dir = data_dir / "outputs"
+        output_dir.mkdir(exist_ok=True)
+
+        report = analysis_script.RunReport(profile=profile, output_path=output_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if streaming:
+                sentiment_df = analysis_script.load_sentiment_data(data_dir)
+                with report.stage("stream_metrics", rows_in=n_trades) as record:
+                    daily_metrics, _, _ = analysis_script.stream_daily_metrics(
+                        sentiment_df, data_path=data_dir
+                    )
+                    record["rows_out"] = len(daily_metrics)
+            else:
+                # the columnar cache would turn the load stage into a cache read
+                with report.stage("load", rows_in=n_trades) as record:
+                    merged_df, _ = analysis_script.load_and_clean_data(data_dir, use_cache=False)
+                    record["rows_out"] = len(merged_df)
+                with report.stage("metrics", rows_in=len(merged_df)) as record:
+                    daily_metrics = analysis_script.create_daily_metrics(merged_df)
+                    record["rows_out"] = len(daily_metrics)
+                with report.stage("segments", rows_in=len(merged_df)) as record:
+                    trader_profile = analysis_script.create_trader_segments(merged_df)
+                    record["rows_out"] = len(trader_profile)
+                del merged_df
+
+            with report.stage("stats", rows_in=len(daily_metrics)):
+                analysis_script.statistical_analysis(daily_metrics, output_path=output_dir)
+
+        for record in report.stages:
+            record = dict(record, trades=n_trades)
+            record["rows_per_s"] = round(record["rows_in"] / max(record["wall_s"], 1e-9))
+            results.append(record)
+            print(f"{n_trades:>12,} {record['stage']:>15} {record['wall_s']:>9.3f}s "
+                  f"{record['rows_per_s']:>14,} rows/s {record['peak_rss_mb'] or 0:>9.0f} MB")
+
+    return pd.DataFrame(results).astype({"rows_in": "Int64", "rows_out": "Int64"})
+
+
+#interpreter start-up
+STARTUP_SNIPPETS = {
+    "lazy import": "import analysis_script",
+    "eager plotting stack": "import analysis_script; analysis_script._plotting(); import scipy.stats",
+    "headless metrics run": (
+        "import analysis_script, sys; "
+        "analysis_script.main(['--headless', '--stages', 'metrics', '--data-dir', sys.argv[1], "
+        "'--output-dir', sys.argv[2]])"
+    ),
+}
+
+LOADED_CHECK = "; import sys; print('LOADED', 'matplotlib' in sys.modules, 'scipy' in sys.modules)"
+
+
+def bench_startup(repeats, data_dir=None):
+
+    src_dir = Path(__file__).resolve().parent
+    # runs write their reports into a scratch folder, never the repo's outputs/
+    output_dir = tempfile.TemporaryDirectory(prefix="startup_")
+    rows = []
+    for label, snippet in STARTUP_SNIPPETS.items():
+        args = [data_dir, output_dir.name] if "sys.argv" in snippet else []
+        if "sys.argv" in snippet and not data_dir:
+            continue
+
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", snippet, *args],
+                           cwd=src_dir, check=True, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+
+        # a separate run reports which heavy modules ended up imported
+        output = subprocess.run([sys.executable, "-c", snippet + LOADED_CHECK, *args],
+                                cwd=src_dir, check=True, capture_output=True, text=True).stdout
+        _, matplotlib_loaded, scipy_loaded = output.strip().splitlines()[-1].split()
+
+        rows.append({
+            "case": label,
+            "median_s": round(statistics.median(timings), 3),
+            "min_s": round(min(timings), 3),
+            "matplotlib": matplotlib_loaded,
+            "scipy": scipy_loaded,
+        })
+
+    output_dir.cleanup()
+    results = pd.DataFrame(rows)
+    print(results.to_string(index=False))
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmarks for analysis_script")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    daily = commands.add_parser("daily-metrics", help="legacy vs single-pass create_daily_metrics")
+    daily.add_argument("--sizes", default="1000000,10000000,50000000",
+                       help="comma-separated synthetic trade counts")
+    daily.add_argument("--accounts", type=int, default=1000)
+    daily.add_argument("--data-root", default=BENCH_DATA,
+                       help="generated datasets are kept here and reused")
+    daily.add_argument("--repeats", type=int, default=1)
+
+    pipeline = commands.add_parser("pipeline", help="time each stage on synthetic CSV exports")
+    pipeline.add_argument("--sizes", default="1e5,1e6,1e7,1e8",
+                          help="comma-separated synthetic trade counts")
+    pipeline.add_argument("--accounts", type=int, default=32)
+    pipeline.add_argument("--data-root", default=BENCH_DATA,
+                          help="generated datasets are kept here and reused")
+    pipeline.add_argument("--streaming", action="store_true",
+                          help="benchmark the chunked streaming path instead")
+    pipeline.add_argument("--profile", action="store_true",
+                          help="also record tracemalloc peaks and cProfile dumps")
+    pipeline.add_argument("--output", default=BENCH_RESULTS)
+
+    startup = commands.add_parser("startup", help="interpreter start-up with lazy vs eager imports")
+    startup.add_argument("--repeats", type=int, default=5)
+    startup.add_argument("--data-dir", default=None,
+                         help="also time a headless metrics-only run on this data folder")
+
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        print("=" * 80)
+        print("BENCHMARK: start-up time")
+        print("=" * 80)
+        bench_startup(args.repeats, args.data_dir)
+        return
+
+    sizes = [int(float(size)) for size in args.sizes.split(",")]
+
+    if args.command == "daily-metrics":
+        print("=" * 80)
+        print("BENCHMARK: create_daily_metrics (legacy vs single-pass)")
+        print("=" * 80)
+        bench_daily_metrics(sizes, args.accounts, args.data_root, args.repeats)
+    else:
+        print("=" * 80)
+        print("BENCHMARK: pipeline stages")
+        print("=" * 80)
+        results = bench_pipeline(sizes, args.accounts, args.data_root, args.streaming, args.profile)
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        results.to_csv(args.output, index=False)
+        print(f"\n✅ Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
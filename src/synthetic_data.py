@@ -0,0 +1,141 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+COINS = ["BTC", "ETH", "SOL", "HYPE", "@107", "XRP", "DOGE", "SUI", "AVAX", "LINK"]
+
+#Hyperliquid export header, in file order
+TRADER_HEADER = [
+    "Account", "Coin", "Execution Price", "Size Tokens", "Size USD", "Side",
+    "Timestamp IST", "Start Position", "Direction", "Closed PnL",
+    "Transaction Hash", "Order ID", "Crossed", "Fee", "Trade ID", "Timestamp"
+]
+
+IST_OFFSET = pd.Timedelta(hours=5, minutes=30)
+
+
+def make_accounts(n_accounts, seed=42):
+    rng = np.random.default_rng(seed)
+    raw = rng.integers(0, 2 ** 63, size=(n_accounts, 3), dtype=np.int64)
+    return np.array([f"0x{a:016x}{b:016x}{c:08x}"[:42] for a, b, c in raw], dtype=object)
+
+
+def generate_sentiment(start="2023-05-01", n_days=730, seed=42):
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_days, freq="D")
+
+    # mean-reverting walk around 50, like the published 0-100 index
+    noise = rng.normal(0, 7, n_days)
+    value = np.empty(n_days)
+    value[0] = 50 + noise[0]
+    for day in range(1, n_days):
+        value[day] = 50 + 0.93 * (value[day - 1] - 50) + noise[day]
+    value = np.clip(value, 1, 99).round().astype(int)
+
+    classification = np.select(
+        [value < 25, value < 47, value < 55, value < 75],
+        ["Extreme Fear", "Fear", "Neutral", "Greed"],
+        default="Extreme Greed"
+    )
+
+    # one reading per day at 05:30 UTC, as in the published export
+    timestamp = (dates.asi8 // 10 ** 9) + int(IST_OFFSET.total_seconds())
+
+    return pd.DataFrame({
+        "timestamp": timestamp,
+        "value": value,
+        "classification": classification,
+        "date": dates.strftime("%Y-%m-%d"),
+    })
+
+
+def _format_minutes(minutes, start):
+    # strftime once per distinct minute, then broadcast
+    codes, uniques = pd.factorize(minutes)
+    stamps = (pd.Timestamp(start) + pd.to_timedelta(uniques, unit="min")).strftime("%d-%m-%Y %H:%M")
+    return np.asarray(stamps, dtype=object).take(codes)
+
+
+def generate_trades(n_trades, n_accounts=32, start="2023-05-01", n_days=730,
+                    seed=42, chunk_size=1_000_000):
+
+    rng = np.random.default_rng(seed)
+    accounts = make_accounts(n_accounts, seed)
+    # a few accounts generate most of the fills, as in the real export
+    weights = rng.pareto(1.5, n_accounts) + 0.1
+    weights /= weights.sum()
+
+    emitted = 0
+    while emitted < n_trades:
+        n = min(chunk_size, n_trades - emitted)
+
+        minutes = np.sort(rng.integers(0, n_days * 24 * 60, n))
+        side = np.where(rng.random(n) < 0.48, "BUY", "SELL")
+        size_usd = np.round(rng.lognormal(7.5, 1.5, n), 2)
+        price = np.round(rng.lognormal(3, 2, n), 4)
+        closing = rng.random(n) < 0.45
+        closed_pnl = np.where(closing, np.round(rng.normal(0.01, 0.08, n) * size_usd, 6), 0.0)
+        trade_time = pd.Timestamp(start) + pd.to_timedelta(minutes, unit="min")
+
+        yield pd.DataFrame({
+            "Account": accounts[rng.choice(n_accounts, n, p=weights)],
+            "Coin": np.asarray(COINS, dtype=object)[rng.integers(0, len(COINS), n)],
+            "Execution Price": price,
+            "Size Tokens": np.round(size_usd / price, 6),
+            "Size USD": size_usd,
+            "Side": side,
+            "Timestamp IST": _format_minutes(minutes, start),
+            "Start Position": np.round(rng.normal(0, 1000, n), 6),
+            "Direction": np.where(closing, np.where(side == "BUY", "Close Short", "Close Long"),
+                                  np.where(side == "BUY", "Open Long", "Open Short")),
+            "Closed PnL": closed_pnl,
+            "Transaction Hash": [f"0x{h:016x}" for h in rng.integers(0, 2 ** 63, n, dtype=np.int64)],
+            "Order ID": rng.integers(10 ** 10, 10 ** 11, n),
+            "Crossed": rng.random(n) < 0.7,
+            "Fee": np.round(size_usd * 0.00035, 6),
+            "Trade ID": np.arange(emitted, emitted + n, dtype=np.int64) + 10 ** 14,
+            "Timestamp": ((trade_time - IST_OFFSET).asi8 // 10 ** 6).astype(float),
+        }, columns=TRADER_HEADER)
+
+        emitted += n
+
+
+def write_dataset(output_dir, n_trades, n_accounts=32, n_days=730,
+                  start="2023-05-01", seed=42, chunk_size=1_000_000,
+                  sentiment_file="fear_greed_index.csv", trader_file="historical_data.csv"):
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    generate_sentiment(start, n_days, seed).to_csv(output_dir / sentiment_file, index=False)
+
+    trader_path = output_dir / trader_file
+    for i, chunk in enumerate(generate_trades(n_trades, n_accounts, start, n_days, seed, chunk_size)):
+        chunk.to_csv(trader_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+    return output_dir
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Write a synthetic sentiment/trader dataset")
+    parser.add_argument("output_dir", help="directory for fear_greed_index.csv and historical_data.csv")
+    parser.add_argument("--trades", type=float, default=1e6)
+    parser.add_argument("--accounts", type=int, default=32)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--start", default="2023-05-01")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    write_dataset(args.output_dir, int(args.trades), args.accounts, args.days,
+                  args.start, args.seed, args.chunk_size)
+    print(f"✅ Wrote {int(args.trades):,} trades to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
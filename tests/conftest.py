@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+@pytest.fixture
+def daily_metrics(rng):
+    # a few accounts over irregular days in both regimes
+    rows = []
+    for account in ["0xaaa", "0xbbb", "0xccc"]:
+        days = np.sort(rng.choice(np.arange(200), size=120, replace=False))
+        for day in days:
+            trades = int(rng.integers(1, 12))
+            rows.append({
+                "account": account,
+                "trade_date": pd.Timestamp("2024-01-01") + pd.Timedelta(days=int(day)),
+                "sentiment_binary": "Fear" if rng.random() < 0.45 else "Greed",
+                "net_pnl": float(rng.normal(50, 400)),
+                "num_trades": trades,
+                "win_rate": int(rng.integers(0, trades + 1)) / trades,
+            })
+    return pd.DataFrame(rows)
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+import analysis_script
+import synthetic_data
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return synthetic_data.write_dataset(tmp_path_factory.mktemp("data"), 20_000, n_accounts=12,
+                                        n_days=120)
+
+
+def _run(data_path, output_path, **options):
+    pipeline = analysis_script.Pipeline(data_path=data_path, output_path=output_path,
+                                        use_cache=False, headless=True, **options)
+    pipeline.run(["metrics", "segments"])
+    return pipeline
+
+
+def _plain(df, keys):
+    # the pandas backend keeps sentiment_binary categorical after compact_dtypes
+    df = df.astype({"sentiment_binary": object}) if "sentiment_binary" in df else df
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def test_spill_backend_matches_pandas(dataset, tmp_path):
+    pandas_run = _run(dataset, tmp_path / "pandas")
+    spill_run = _run(dataset, tmp_path / "spill", backend="spill")
+
+    pd.testing.assert_frame_equal(
+        _plain(spill_run.spilled_daily.to_pandas(), analysis_script.DAILY_KEYS),
+        _plain(pandas_run.daily_metrics, analysis_script.DAILY_KEYS),
+        check_exact=True,
+    )
+    pd.testing.assert_frame_equal(
+        _plain(spill_run.trader_profile, "account"),
+        _plain(pandas_run.trader_profile, "account"),
+        check_exact=True,
+    )
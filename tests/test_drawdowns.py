@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_script
+
+
+@pytest.fixture
+def trades(rng):
+    n = 600
+    minutes = rng.integers(0, 60 * 24 * 30, n)
+    # repeated timestamps check that ties keep file order
+    minutes[rng.random(n) < 0.1] = 1000
+    return pd.DataFrame({
+        "account": rng.choice(["0xaaa", "0xbbb", "0xccc", "0xddd"], n),
+        "trade_time": pd.Timestamp("2024-03-01") + pd.to_timedelta(minutes, unit="min"),
+        "sentiment_binary": rng.choice(["Fear", "Greed"], n),
+        "closed_pnl": rng.normal(0, 100, n).round(2),
+        "fee": rng.uniform(0, 2, n).round(2),
+    })
+
+
+def _reference(trades, regime):
+    # one trade at a time, from a flat account at zero equity
+    if regime != "All":
+        trades = trades[trades["sentiment_binary"] == regime]
+    rows = []
+    for account, frame in trades.groupby("account", sort=True):
+        frame = frame.sort_values("trade_time", kind="stable")
+        equity = peak = max_drawdown = 0.0
+        anchor = frame["trade_time"].iloc[0]
+        last_high = None
+        peak_time = trough_time = recovery_time = None
+        underwater = False
+        longest = 0.0
+        for time, pnl in zip(frame["trade_time"], frame["closed_pnl"] - frame["fee"]):
+            equity += pnl
+            peak = max(peak, equity)
+            drawdown = peak - equity
+            if drawdown == 0:
+                if underwater:
+                    longest = max(longest, (time - anchor) / pd.Timedelta(days=1))
+                if max_drawdown > 0 and recovery_time is None:
+                    recovery_time = time
+                anchor, last_high, underwater = time, time, False
+            else:
+                underwater = True
+            if drawdown > max_drawdown:
+                max_drawdown = drawdown
+                trough_time = time
+                peak_time = last_high if last_high is not None else frame["trade_time"].iloc[0]
+                recovery_time = None
+        if underwater:
+            longest = max(longest, (frame["trade_time"].iloc[-1] - anchor) / pd.Timedelta(days=1))
+        rows.append({
+            "account": account, "trades": len(frame), "final_equity": equity, "peak_equity": peak,
+            "max_drawdown": max_drawdown, "peak_time": peak_time, "trough_time": trough_time,
+            "recovery_time": recovery_time, "longest_underwater_days": longest,
+            "current_drawdown": peak - equity,
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("regime", ["All", "Fear", "Greed"])
+def test_drawdown_summary_matches_reference_loop(trades, regime):
+    got = analysis_script.drawdown_summary(analysis_script.equity_curve(trades, regime))
+    expected = _reference(trades, regime)
+
+    assert got["account"].tolist() == expected["account"].tolist()
+    np.testing.assert_array_equal(got["trades"], expected["trades"])
+    for column in ["final_equity", "peak_equity", "max_drawdown", "current_drawdown",
+                   "longest_underwater_days"]:
+        np.testing.assert_allclose(got[column], expected[column], rtol=1e-9, atol=1e-9)
+    for column in ["peak_time", "trough_time", "recovery_time"]:
+        np.testing.assert_array_equal(
+            pd.to_datetime(got[column]).to_numpy(), pd.to_datetime(expected[column]).to_numpy()
+        )
@@ -0,0 +1,58 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+import analysis_script
+import synthetic_data
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    full = synthetic_data.write_dataset(tmp_path_factory.mktemp("full"), 20_000, n_accounts=12,
+                                        n_days=120)
+
+    # the first run sees every other trade, the append the rest
+    trades = pd.read_csv(full / analysis_script.TRADER_FILE)
+    partial = tmp_path_factory.mktemp("partial")
+    shutil.copy(full / analysis_script.SENTIMENT_FILE, partial)
+    trades.iloc[::2].to_csv(partial / analysis_script.TRADER_FILE, index=False)
+    appended = partial / "appended.csv"
+    trades.iloc[1::2].to_csv(appended, index=False)
+    return full, partial, appended
+
+
+def _plain(df, keys):
+    df = df.astype({"sentiment_binary": object}) if "sentiment_binary" in df else df
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("lag", [None, "1D"])
+def test_append_matches_full_run(dataset, tmp_path, lag):
+    full, partial, appended = dataset
+
+    expected = analysis_script.Pipeline(data_path=full, output_path=tmp_path / "full",
+                                        use_cache=False, headless=True, sentiment_lag=lag)
+    expected.run(["metrics", "segments"])
+
+    analysis_script.Pipeline(data_path=partial, output_path=tmp_path / "append", use_cache=False,
+                             headless=True, sentiment_lag=lag).run(["metrics"])
+    daily_metrics, trader_profile = analysis_script.update_incremental(
+        appended, partial, tmp_path / "append", "csv", lag=lag
+    )
+
+    # the sums are exact; std and means are finalized from sums of squares
+    pd.testing.assert_frame_equal(_plain(daily_metrics, analysis_script.DAILY_KEYS),
+                                  _plain(expected.daily_metrics, analysis_script.DAILY_KEYS),
+                                  rtol=1e-9)
+    pd.testing.assert_frame_equal(_plain(trader_profile, "account"),
+                                  _plain(expected.trader_profile, "account"), rtol=1e-9)
+
+
+def test_append_refuses_other_sentiment_settings(dataset, tmp_path):
+    _, partial, appended = dataset
+
+    analysis_script.Pipeline(data_path=partial, output_path=tmp_path, use_cache=False,
+                             headless=True, sentiment_lag="1D").run(["metrics"])
+    with pytest.raises(ValueError, match="--sentiment-lag"):
+        analysis_script.update_incremental(appended, partial, tmp_path, "csv")
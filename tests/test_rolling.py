@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_script
+
+
+def _brute_force(daily_metrics, account, window, regime):
+    # every day the account traded closes a window over its regime days
+    frame = daily_metrics[daily_metrics["account"] == account]
+    all_days = np.sort(frame["trade_date"].unique())
+    if regime != "All":
+        frame = frame[frame["sentiment_binary"] == regime]
+    by_day = frame.groupby("trade_date")
+    days = pd.DataFrame({
+        "pnl": by_day["net_pnl"].sum(),
+        "trades": by_day["num_trades"].sum(),
+        "wins": (frame["win_rate"] * frame["num_trades"]).round().groupby(frame["trade_date"]).sum(),
+    })
+
+    rows = {}
+    for day in all_days:
+        inside = days[(days.index > day - pd.Timedelta(days=window)) & (days.index <= day)]
+        if inside.empty:
+            continue
+        std = inside["pnl"].std()
+        rows[day] = {
+            "active_days": len(inside),
+            "net_pnl": inside["pnl"].sum(),
+            "win_rate": inside["wins"].sum() / inside["trades"].sum(),
+            "sharpe": inside["pnl"].mean() / std if len(inside) > 1 and std > 0 else np.nan,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+@pytest.mark.parametrize("regime", ["All", "Fear"])
+def test_rolling_matches_brute_force(daily_metrics, regime):
+    rolling = analysis_script.rolling_metrics(daily_metrics, windows=[30])
+    for account in daily_metrics["account"].unique():
+        got = rolling[(rolling["account"] == account) & (rolling["regime"] == regime)]
+        got = got.set_index("trade_date")
+        expected = _brute_force(daily_metrics, account, 30, regime)
+        assert list(got.index) == list(expected.index)
+        np.testing.assert_array_equal(got["active_days"], expected["active_days"])
+        np.testing.assert_allclose(got["net_pnl"], expected["net_pnl"], rtol=1e-9)
+        np.testing.assert_allclose(got["win_rate"], expected["win_rate"], rtol=1e-12)
+        np.testing.assert_allclose(got["sharpe"], expected["sharpe"], rtol=1e-9)
+
+
+def test_extension_matches_full_recompute(daily_metrics):
+    since = pd.Timestamp("2024-05-01")
+    full = analysis_script.rolling_metrics(daily_metrics)
+    extended = analysis_script.rolling_metrics(daily_metrics, since=since)
+    full = full[full["trade_date"] >= since].reset_index(drop=True)
+
+    for column in ["active_days", "net_pnl", "win_rate", "sharpe"]:
+        np.testing.assert_array_equal(full[column].to_numpy(), extended[column].to_numpy())
+    # drawdowns come from the running equity, which starts where the history does
+    np.testing.assert_allclose(full["drawdown"], extended["drawdown"], rtol=1e-9, atol=1e-9)
+
+
+def test_window_moments_blocks(rng):
+    values = rng.normal(size=50)
+    counted = rng.random(50) < 0.7
+    values = np.where(counted, values, 0.0)
+    stop = np.arange(50)
+    start = np.maximum(stop - rng.integers(0, 10, 50), 0)
+
+    whole = analysis_script._window_moments(values, counted, start, stop)
+    blocked = analysis_script._window_moments(values, counted, start, stop, block=7)
+    np.testing.assert_array_equal(whole[0], blocked[0])
+    np.testing.assert_array_equal(whole[1], blocked[1])
+
+    for row in range(50):
+        inside = values[start[row]:stop[row] + 1][counted[start[row]:stop[row] + 1]]
+        spread = ((inside - inside.mean()) ** 2).sum() if len(inside) else 0.0
+        assert whole[0][row] == pytest.approx(inside.sum())
+        assert whole[1][row] == pytest.approx(spread)
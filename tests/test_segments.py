@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_script
+
+
+def _rank_error(values, estimate, q):
+    return abs(np.mean(values <= estimate) - q)
+
+
+def test_sketch_quantiles_within_rank_error(rng):
+    values = rng.lognormal(8, 1, 50_000)
+    sketch = analysis_script.QuantileSketch(k=200)
+    for batch in np.array_split(values, 25):
+        sketch.update(batch)
+
+    assert sketch.count == len(values)
+    for q in [0.1, 0.5, 0.75, 0.99]:
+        assert _rank_error(values, sketch.quantile(q), q) < 0.02
+
+
+def test_merged_sketches_cover_every_shard(rng):
+    shards = [rng.normal(loc, 1, 20_000) for loc in (0, 3, 6)]
+    sketches = [{"x": analysis_script.QuantileSketch(k=200).update(shard)} for shard in shards]
+    merged = analysis_script.merge_sketches(sketches)["x"]
+
+    values = np.concatenate(shards)
+    assert merged.count == len(values)
+    for q in [0.25, 0.5, 0.75]:
+        assert _rank_error(values, merged.quantile(q), q) < 0.02
+
+
+def test_exact_thresholds_match_series_quantile(rng):
+    profile = pd.DataFrame({
+        "account": [f"0x{i:03x}" for i in range(101)],
+        "avg_size": rng.lognormal(8, 1, 101),
+        "total_trades": rng.integers(1, 500, 101),
+        "net_profit": rng.normal(0, 100, 101),
+        "overall_win_rate": rng.random(101),
+    })
+    segmented = analysis_script.assign_trader_segments(profile.copy())
+
+    median = profile["avg_size"].quantile(0.5)
+    expected = np.where(profile["avg_size"] >= median, "High Volume", "Low Volume")
+    np.testing.assert_array_equal(segmented["volume_segment"], expected)
+
+    upper = profile["total_trades"].quantile(0.75)
+    expected = np.where(profile["total_trades"] >= upper, "Frequent", "Infrequent")
+    np.testing.assert_array_equal(segmented["frequency_segment"], expected)
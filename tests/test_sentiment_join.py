@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_script
+
+
+@pytest.fixture
+def sentiment():
+    dates = pd.date_range("2024-01-01", periods=60, freq="D")
+    # a few missing days so tolerance and gaps matter
+    dates = dates.delete([5, 6, 7, 30])
+    labels = np.where(np.arange(len(dates)) % 3 == 0, "Fear", "Greed")
+    return pd.DataFrame({"date": dates, "sentiment_binary": labels})
+
+
+@pytest.fixture
+def trades(rng):
+    n = 2000
+    times = pd.Timestamp("2023-12-30") + pd.to_timedelta(rng.integers(0, 65 * 24 * 60, n), unit="min")
+    return pd.DataFrame({"trade_time": times, "trade_date": times.normalize(), "row": np.arange(n)})
+
+
+@pytest.mark.parametrize("lag", ["0h", "6h", "1D"])
+@pytest.mark.parametrize("tolerance", ["1D", "3D"])
+def test_asof_join_matches_merge_asof(trades, sentiment, lag, tolerance):
+    aligned, _ = analysis_script.align_sentiment(trades, sentiment, join="asof", lag=lag,
+                                                 tolerance=tolerance)
+
+    keys = (
+        trades["trade_time"].dt.tz_localize(analysis_script.TRADE_TIMEZONE)
+        .dt.tz_convert("UTC").dt.tz_localize(None)
+        - pd.Timedelta(lag)
+    )
+    expected = pd.merge_asof(
+        trades.assign(key=keys).sort_values("key"), sentiment.sort_values("date"),
+        left_on="key", right_on="date", direction="backward", tolerance=pd.Timedelta(tolerance),
+    ).dropna(subset=["sentiment_binary"]).sort_values("row")
+
+    np.testing.assert_array_equal(aligned["row"], expected["row"])
+    np.testing.assert_array_equal(aligned["sentiment_binary"], expected["sentiment_binary"])
+    np.testing.assert_array_equal(aligned["date"], expected["date"])
+
+
+def test_date_join_matches_merge(trades, sentiment):
+    aligned, _ = analysis_script.align_sentiment(trades, sentiment, join="date")
+    expected = trades.merge(sentiment, left_on="trade_date", right_on="date", how="inner")
+    expected = expected.sort_values("row")
+
+    np.testing.assert_array_equal(aligned["row"], expected["row"])
+    np.testing.assert_array_equal(aligned["sentiment_binary"], expected["sentiment_binary"])
+
+
+@pytest.mark.parametrize("join", ["date", "asof"])
+def test_empty_sentiment_matches_nothing(trades, sentiment, join):
+    aligned, unmatched = analysis_script.align_sentiment(trades, sentiment.iloc[:0], join=join,
+                                                         labels=["Fear"])
+    assert aligned.empty
+    assert unmatched == len(trades)
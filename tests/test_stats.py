@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+import analysis_script
+
+
+def _columns(rng, n=400):
+    # a shifted normal, a heavily tied integer column and one with NaNs
+    in_x = rng.random(n) < 0.4
+    shifted = rng.normal(0, 1, n) + np.where(in_x, 0.3, 0.0)
+    tied = rng.integers(0, 5, n).astype("float64")
+    gappy = rng.normal(0, 1, n)
+    gappy[rng.random(n) < 0.2] = np.nan
+    return np.column_stack([shifted, tied, gappy]), in_x
+
+
+def test_rank_tests_match_scipy(rng):
+    values, in_x = _columns(rng)
+    u1, p = analysis_script.rank_tests(values, in_x)
+
+    for column in range(values.shape[1]):
+        x = values[in_x, column]
+        y = values[~in_x, column]
+        expected = stats.mannwhitneyu(x[~np.isnan(x)], y[~np.isnan(y)], alternative="two-sided",
+                                      method="asymptotic", use_continuity=True)
+        assert u1[column] == pytest.approx(expected.statistic)
+        assert p[column] == pytest.approx(expected.pvalue, rel=1e-9)
+
+
+def test_tie_ranks_match_scipy(rng):
+    values, _ = _columns(rng)
+    ranks, _ = analysis_script._tie_ranks(values[:, :2])
+    for column in range(2):
+        np.testing.assert_allclose(ranks[:, column], stats.rankdata(values[:, column]))
+
+
+def test_resampling_does_not_depend_on_workers(rng, monkeypatch):
+    # several chunks, so the parallel run really splits the resamples
+    monkeypatch.setattr(analysis_script, "STATS_BATCH", 120 * 70)
+    values, in_x = _columns(rng, n=120)
+    serial = analysis_script.compare_groups(values, in_x, n_resamples=300, seed=3, workers=1)
+    parallel = analysis_script.compare_groups(values, in_x, n_resamples=300, seed=3, workers=2)
+    for key in ["ci_low", "ci_high", "p_permutation"]:
+        np.testing.assert_array_equal(serial[key], parallel[key])
+
+
+def test_bootstrap_interval_matches_percentile_bootstrap(rng):
+    values, in_x = _columns(rng, n=300)
+    column = values[:, :1]
+    result = analysis_script.compare_groups(column, in_x, n_resamples=4000, seed=1)
+
+    x, y = column[in_x, 0], column[~in_x, 0]
+    reference = stats.bootstrap((y, x), lambda a, b: a.mean() - b.mean(), n_resamples=4000,
+                                method="percentile", confidence_level=0.95,
+                                random_state=np.random.default_rng(2), vectorized=False)
+    interval = reference.confidence_interval
+    width = interval.high - interval.low
+    assert result["ci_low"][0] == pytest.approx(interval.low, abs=0.1 * width)
+    assert result["ci_high"][0] == pytest.approx(interval.high, abs=0.1 * width)
+    assert result["ci_low"][0] < result["mean_diff"][0] < result["ci_high"][0]
+
+
+def test_permutation_p_value_matches_scipy(rng):
+    values, in_x = _columns(rng, n=300)
+    column = values[:, :1]
+    result = analysis_script.compare_groups(column, in_x, n_resamples=4000, seed=1)
+
+    x, y = column[in_x, 0], column[~in_x, 0]
+    reference = stats.permutation_test((y, x), lambda a, b: a.mean() - b.mean(), n_resamples=4000,
+                                       alternative="two-sided", vectorized=False,
+                                       random_state=np.random.default_rng(2))
+    assert result["p_permutation"][0] == pytest.approx(reference.pvalue, abs=0.02)
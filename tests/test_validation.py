@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+import analysis_script
+
+
+def _trades(rows):
+    return pd.DataFrame(rows, columns=["Account", "Coin", "Side", "Timestamp IST", "Closed PnL",
+                                       "Size USD", "Fee"])
+
+
+def test_fill_index_flags_repeats_across_batches(rng):
+    fills = analysis_script.FillIndex()
+    batches = [rng.integers(0, 500, 300).astype(np.uint64) for _ in range(6)]
+
+    seen = set()
+    for hashes in batches:
+        expected = []
+        for value in hashes:
+            expected.append(value in seen)
+            seen.add(value)
+        np.testing.assert_array_equal(fills.seen_before(hashes), expected)
+
+
+def test_duplicate_fills_are_optional():
+    trades = _trades([
+        ["0xaaa", "BTC", "BUY", "01-01-2024 10:00", "5", "100", "0.1"],
+        ["0xaaa", "BTC", "BUY", "01-01-2024 10:00", "5", "100", "0.1"],
+    ])
+
+    deduped = analysis_script.DataValidator()
+    assert len(analysis_script._clean_trader_frame(trades.copy(), deduped)) == 1
+    assert deduped.counts["trades"]["duplicate_fill"] == 1
+
+    kept = analysis_script.DataValidator(dedupe=False)
+    assert len(analysis_script._clean_trader_frame(trades.copy(), kept)) == 2
+    assert "duplicate_fill" not in kept.counts["trades"]
+
+
+def test_blank_sentiment_value_is_not_out_of_range(tmp_path):
+    pd.DataFrame({
+        "timestamp": [1, 2, 3],
+        "value": [40, None, 150],
+        "classification": ["Fear", "Extreme Fear", "Greed"],
+        "date": ["2024-01-01", "2024-01-02", "2024-01-03"],
+    }).to_csv(tmp_path / analysis_script.SENTIMENT_FILE, index=False)
+
+    validator = analysis_script.DataValidator()
+    sentiment = analysis_script.load_sentiment_data(tmp_path, validator)
+
+    assert validator.counts["sentiment"]["value_out_of_range"] == 1
+    assert list(sentiment["date"].dt.day) == [1, 2]